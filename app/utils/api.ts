@@ -129,6 +129,7 @@ export const productsAPI = {
     max_price?: number;
     sort_by?: string;
     sort_order?: string;
+    view?: 'card' | 'detail';
   }) => {
     const queryParams = new URLSearchParams();
     
@@ -144,6 +145,31 @@ export const productsAPI = {
     return request(`/products${queryString}`);
   },
   
+  getProductFacets: (params?: {
+    skip?: number;
+    limit?: number;
+    category?: string;
+    search?: string;
+    min_price?: number;
+    max_price?: number;
+    sort_by?: string;
+    sort_order?: string;
+    view?: 'card' | 'detail';
+  }) => {
+    const queryParams = new URLSearchParams();
+    
+    if (params) {
+      Object.entries(params).forEach(([key, value]) => {
+        if (value !== undefined) {
+          queryParams.append(key, String(value));
+        }
+      });
+    }
+    
+    const queryString = queryParams.toString() ? `?${queryParams.toString()}` : '';
+    return request(`/products/facets${queryString}`);
+  },
+  
   getProduct: (id: number) => {
     return request(`/products/${id}`);
   },
@@ -156,6 +182,10 @@ export const productsAPI = {
     return request('/products/categories/all');
   },
   
+  getCategoryIndex: () => {
+    return request('/products/categories/index');
+  },
+  
   getProductReviews: (productId: number) => {
     return request(`/products/${productId}/reviews`);
   },
@@ -1,8 +1,13 @@
 import os
+import logging
 import motor.motor_asyncio
 from beanie import init_beanie
-from typing import Optional, List, Any
-from contextlib import asynccontextmanager
+from pymongo import IndexModel
+from typing import Optional, List, Any, Tuple, Callable, Awaitable, TypeVar
+from .utils.profiling import command_profiler
+from .utils.telemetry import pool_monitor
+
+logger = logging.getLogger(__name__)
 
 # Get MongoDB URL from environment variable or use default
 MONGODB_URL = os.environ.get(
@@ -10,8 +15,30 @@ MONGODB_URL = os.environ.get(
     "mongodb://localhost:27017/furniture_haven"
 )
 
+# Check indexes and query plans at startup
+VERIFY_INDEXES = os.environ.get("VERIFY_INDEXES", "true").lower() == "true"
+
+# Query shapes the routers run, as (collection, filter, sort). Values are
+# placeholders; only the plan the server picks for each shape matters.
+QUERY_SHAPES = [
+    ("users", {"email": ""}, None),
+    ("addresses", {"user_id": ""}, None),
+    ("products", {"slug": "", "is_active": True}, None),
+    ("products", {"is_active": True}, [("created_at", -1), ("_id", -1)]),
+    ("products", {"is_active": True}, [("price", 1), ("_id", 1)]),
+    ("products", {"category_ids": "", "is_active": True}, [("created_at", -1), ("_id", -1)]),
+    ("products", {"updated_at": {"$gt": 0}}, None),
+    ("carts", {"_id": ""}, None),
+    ("orders", {"user_id": ""}, [("created_at", -1), ("_id", -1)]),
+    ("orders", {"status": ""}, [("created_at", -1), ("_id", -1)]),
+    ("orders", {}, [("created_at", -1), ("_id", -1)]),
+    ("order_items", {"order_id": ""}, None),
+    ("reviews", {"product_id": "", "user_id": ""}, None),
+    ("reviews", {"product_id": ""}, [("created_at", -1), ("_id", -1)]),
+]
+
 # Create MongoDB client
-client = motor.motor_asyncio.AsyncIOMotorClient(MONGODB_URL)
+client = motor.motor_asyncio.AsyncIOMotorClient(MONGODB_URL, event_listeners=[command_profiler, pool_monitor])
 db = client.get_default_database()
 
 # Global database session
@@ -23,10 +50,13 @@ async def init_db():
         Category, 
         Product, 
         ProductImage, 
+        Cart, 
+        GuestCart, 
         CartItem, 
         Order, 
         OrderItem, 
-        Review
+        Review,
+        SeedRun
     )
     
     # Initialize Beanie with the models
@@ -38,13 +68,89 @@ async def init_db():
             Category,
             Product,
             ProductImage,
+            Cart,
+            GuestCart,
             CartItem,
             Order,
             OrderItem,
-            Review
+            Review,
+            SeedRun
         ]
     )
+    
+    if VERIFY_INDEXES:
+        await verify_indexes([User, Address, Category, Product, ProductImage, Cart, GuestCart, CartItem, Order, OrderItem, Review])
+
+def _index_key(keys: Any, unique: bool = False) -> Tuple[Tuple[Tuple[str, int], ...], bool]:
+    """Comparable (fields, unique) pair for an index"""
+    pairs = keys.items() if hasattr(keys, "items") else keys
+    return tuple((field, int(direction)) for field, direction in pairs), bool(unique)
+
+def _declared_index_key(index: Any) -> Tuple[Tuple[Tuple[str, int], ...], bool]:
+    """Normalize a Settings.indexes entry (Beanie wraps them after init)"""
+    index = getattr(index, "index", index)
+    if isinstance(index, str):
+        return _index_key([(index, 1)])
+    if isinstance(index, IndexModel):
+        return _index_key(index.document["key"], index.document.get("unique", False))
+    return _index_key(index)
+
+def _has_collection_scan(plan: Any) -> bool:
+    """Whether any stage of an explain plan is a full collection scan"""
+    if isinstance(plan, dict):
+        return plan.get("stage") == "COLLSCAN" or any(_has_collection_scan(v) for v in plan.values())
+    if isinstance(plan, list):
+        return any(_has_collection_scan(v) for v in plan)
+    return False
+
+async def verify_indexes(models: List[Any]):
+    """Log declared indexes that are missing and query shapes that scan a collection"""
+    for model in models:
+        collection = model.get_motor_collection()
+        existing = {
+            _index_key(info["key"], info.get("unique", False))
+            for info in (await collection.index_information()).values()
+        }
+        for index in model.get_settings().indexes or []:
+            key = _declared_index_key(index)
+            if key not in existing:
+                fields, unique = key
+                logger.warning("Missing %sindex %s on %s", "unique " if unique else "", fields, collection.name)
+
+    for name, filters, sort in QUERY_SHAPES:
+        cursor = db[name].find(filters).limit(1)
+        if sort:
+            cursor = cursor.sort(sort)
+        try:
+            plan = await cursor.explain()
+        except Exception as e:
+            logger.warning("Could not explain %s query %s: %s", name, filters, e)
+            continue
+        if _has_collection_scan(plan.get("queryPlanner", plan)):
+            logger.warning("Collection scan on %s for filter %s sort %s", name, list(filters), sort)
+
+# Cached result of the server capability check
+_transactions_supported: Optional[bool] = None
+
+async def supports_transactions() -> bool:
+    """Whether the server is a replica set member or mongos and can run transactions"""
+    global _transactions_supported
+    if _transactions_supported is None:
+        hello = await client.admin.command("hello")
+        _transactions_supported = "setName" in hello or hello.get("msg") == "isdbgrid"
+    return _transactions_supported
+
+T = TypeVar("T")
+
+async def in_transaction(callback: Callable[[Any], Awaitable[T]]) -> T:
+    """Run callback(session) in a transaction and return its result
 
-# Dependency to get the database
-async def get_db():
-    return db 
\ No newline at end of file
+    The driver reruns the whole callback on a TransientTransactionError and
+    retries the commit on an UnknownTransactionCommitResult, so the callback
+    must only write through the session it is given. On standalone servers
+    it runs once with session None.
+    """
+    if not await supports_transactions():
+        return await callback(None)
+    async with await client.start_session() as session:
+        return await session.with_transaction(callback)
@@ -0,0 +1,82 @@
+import sys
+import asyncio
+from typing import Any, AsyncIterator, Dict, List
+from pymongo import DeleteMany, UpdateOne
+from . import database
+from .models import CartItem, Review
+
+# Duplicate groups resolved per bulk write
+BATCH_SIZE = 500
+
+async def _duplicates(collection, keys: List[str], order: Dict[str, int], fields: List[str]) -> AsyncIterator[Dict[str, Any]]:
+    """Groups of documents sharing the given keys, each group's documents in order"""
+    pipeline = [
+        {"$sort": order},
+        {"$group": {
+            "_id": {key: f"${key}" for key in keys},
+            "documents": {"$push": {field: f"${field}" for field in fields}},
+            "count": {"$sum": 1}
+        }},
+        {"$match": {"count": {"$gt": 1}}}
+    ]
+    async for group in collection.aggregate(pipeline, allowDiskUse=True):
+        yield group
+
+async def _resolve(collection, groups: AsyncIterator[Dict[str, Any]], keep, batch_size: int) -> int:
+    """Apply keep(documents) to every group and delete the rest; returns documents removed"""
+    removed = 0
+    operations = []
+    async for group in groups:
+        survivor, *extra = group["documents"]
+        update = keep(group["documents"])
+        if update:
+            operations.append(UpdateOne({"_id": survivor["_id"]}, {"$set": update}))
+        operations.append(DeleteMany({"_id": {"$in": [document["_id"] for document in extra]}}))
+        removed += len(extra)
+        if len(operations) >= batch_size:
+            await collection.bulk_write(operations, ordered=False)
+            operations = []
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
+    return removed
+
+# Remove rows that would stop the unique cart item and review indexes from building
+async def remove_duplicates(batch_size: int = BATCH_SIZE):
+    # Works on the raw collections: init_db builds the unique indexes and
+    # fails while duplicates are still there
+    cart_items = database.db[CartItem.Settings.name]
+    reviews = database.db[Review.Settings.name]
+
+    # A product's lines fold into its oldest line, quantities added together
+    lines_removed = await _resolve(
+        cart_items,
+        _duplicates(cart_items, ["user_id", "product_id"], {"added_at": 1, "_id": 1}, ["_id", "quantity"]),
+        lambda documents: {"quantity": sum(document["quantity"] for document in documents)},
+        batch_size
+    )
+    print(f"Cart items: {lines_removed} duplicate lines merged")
+
+    # Only a user's latest review of a product is kept
+    reviews_removed = await _resolve(
+        reviews,
+        _duplicates(reviews, ["product_id", "user_id"], {"created_at": -1, "_id": -1}, ["_id"]),
+        lambda documents: None,
+        batch_size
+    )
+    print(f"Reviews: {reviews_removed} duplicate reviews removed")
+
+    if reviews_removed:
+        # Summaries still count the removed reviews
+        from .reconcile_ratings import rebuild_ratings
+        await rebuild_ratings()
+
+def dedupe():
+    """Function to run the async cleanup from sync code"""
+    try:
+        asyncio.run(remove_duplicates())
+    except Exception as e:
+        print(f"Error removing duplicates: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    dedupe()
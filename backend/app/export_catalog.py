@@ -0,0 +1,34 @@
+import sys
+import asyncio
+import argparse
+from .utils.catalog_io import export_products
+
+# Write every product to a file (or stdout) in the import format
+async def export_catalog(path: str, format: str):
+    # Import here to avoid circular imports
+    from .database import init_db
+    await init_db()
+
+    stream = sys.stdout if path == "-" else open(path, "w", newline="", encoding="utf-8")
+    try:
+        async for chunk in export_products(format):
+            stream.write(chunk)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+def main():
+    """Function to run the async export from sync code"""
+    parser = argparse.ArgumentParser(description="Export products as NDJSON or CSV")
+    parser.add_argument("path", nargs="?", default="-", help="output file, or - for stdout")
+    parser.add_argument("--format", choices=["ndjson", "csv"], help="defaults to the file extension")
+    args = parser.parse_args()
+    format = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+    try:
+        asyncio.run(export_catalog(args.path, format))
+    except Exception as e:
+        print(f"Error exporting catalog: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
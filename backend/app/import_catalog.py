@@ -0,0 +1,54 @@
+import sys
+import asyncio
+import argparse
+from .utils.catalog_io import IMPORT_CHUNK_SIZE, import_products
+
+# Bytes read from the feed at a time
+READ_SIZE = 1 << 16
+
+def _format_for(path: str) -> str:
+    return "csv" if path.lower().endswith(".csv") else "ndjson"
+
+async def _read(stream):
+    while True:
+        chunk = stream.read(READ_SIZE)
+        if not chunk:
+            break
+        yield chunk
+        # Let other tasks run between reads
+        await asyncio.sleep(0)
+
+# Load a supplier feed or backup into the products collection
+async def import_catalog(path: str, format: str, chunk_size: int = IMPORT_CHUNK_SIZE):
+    # Import here to avoid circular imports
+    from .database import init_db
+    await init_db()
+
+    if path == "-":
+        report = await import_products(_read(sys.stdin.buffer), format, chunk_size)
+    else:
+        with open(path, "rb") as stream:
+            report = await import_products(_read(stream), format, chunk_size)
+
+    for error in report.errors:
+        print(f"Row {error.row} ({error.slug or 'no slug'}): {error.error}", file=sys.stderr)
+    print(f"Catalog import completed: {report.created} created, {report.updated} updated, {report.failed} failed")
+    return report
+
+def main():
+    """Function to run the async import from sync code"""
+    parser = argparse.ArgumentParser(description="Import products from an NDJSON or CSV file")
+    parser.add_argument("path", help="file to import, or - for stdin")
+    parser.add_argument("--format", choices=["ndjson", "csv"], help="defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+    try:
+        report = asyncio.run(import_catalog(args.path, args.format or _format_for(args.path), args.chunk_size))
+    except Exception as e:
+        print(f"Error importing catalog: {e}", file=sys.stderr)
+        sys.exit(1)
+    if report.failed:
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main()
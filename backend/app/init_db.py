@@ -1,11 +1,16 @@
 import os
 import sys
+import json
+import random
 import asyncio
-from motor.motor_asyncio import AsyncIOMotorClient
-from beanie import init_beanie
-from .models import User, Category, Product, ProductImage
-from .utils.auth import get_password_hash
+import argparse
+import hashlib
+import itertools
 from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from . import repositories as repo
+from .models import User, Category, Product, ProductImage, SeedRun
+from .utils.auth import PASSWORD_WORKERS, hash_password
 
 # Admin and test user credentials from environment variables
 ADMIN_EMAIL = os.environ.get("ADMIN_EMAIL", "admin@example.com")
@@ -13,183 +18,286 @@ ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD", "adminpassword")
 TEST_USER_EMAIL = os.environ.get("TEST_USER_EMAIL", "user@example.com")
 TEST_USER_PASSWORD = os.environ.get("TEST_USER_PASSWORD", "userpassword")
 
+# Optional JSON fixture replacing the sample data below
+SEED_FIXTURE = os.environ.get("SEED_FIXTURE") or None
+
+# Generated products added on top of the fixture, for load testing
+SEED_SYNTHETIC_PRODUCTS = int(os.environ.get("SEED_SYNTHETIC_PRODUCTS", 0))
+
+# Products checked and inserted per batch
+SEED_BATCH_SIZE = int(os.environ.get("SEED_BATCH_SIZE", 1000))
+
+CATEGORY_IMAGE_URL = "https://images.unsplash.com/photo-1556228453-efd6c1ff04f6?ixlib=rb-4.0.3&auto=format&fit=crop&w=400&h=300&q=80"
+
+# Sample users, categories and products; passwords come from the environment
+SAMPLE_FIXTURE: Dict[str, Any] = {
+    "name": "sample",
+    "users": [
+        {"email": ADMIN_EMAIL, "full_name": "Admin User", "password": ADMIN_PASSWORD, "is_admin": True},
+        {"email": TEST_USER_EMAIL, "full_name": "Test User", "password": TEST_USER_PASSWORD, "is_admin": False}
+    ],
+    "categories": [
+        {"slug": slug, "name": name, "description": f"Furniture for your {name.lower()}", "image_url": CATEGORY_IMAGE_URL}
+        for slug, name in [
+            ("living-room", "Living Room"),
+            ("bedroom", "Bedroom"),
+            ("office", "Office"),
+            ("kitchen", "Kitchen")
+        ]
+    ],
+    "products": [
+        {
+            "name": "Modern Sofa",
+            "slug": "modern-sofa",
+            "description": "A comfortable and stylish sofa perfect for any living room.",
+            "price": 899.99,
+            "stock": 10,
+            "categories": ["living-room"],
+            "images": [
+                {
+                    "image_url": "https://images.unsplash.com/photo-1555041469-a586c61ea9bc?ixlib=rb-4.0.3&auto=format&fit=crop&w=600&h=600&q=80",
+                    "is_primary": True
+                },
+                {
+                    "image_url": "https://images.unsplash.com/photo-1507473885765-e6ed057f782c?ixlib=rb-4.0.3&auto=format&fit=crop&w=600&h=600&q=80",
+                    "is_primary": False
+                }
+            ]
+        },
+        {
+            "name": "Ergonomic Office Chair",
+            "slug": "ergonomic-office-chair",
+            "description": "Experience ultimate comfort with our ergonomic office chair designed for long work hours.",
+            "price": 299.99,
+            "stock": 15,
+            "categories": ["office"],
+            "images": [
+                {
+                    "image_url": "https://images.unsplash.com/photo-1580480055273-228ff5388ef8?ixlib=rb-4.0.3&auto=format&fit=crop&w=600&h=600&q=80",
+                    "is_primary": True
+                },
+                {
+                    "image_url": "https://images.unsplash.com/photo-1589384267710-7a170981ca78?ixlib=rb-4.0.3&auto=format&fit=crop&w=600&h=600&q=80",
+                    "is_primary": False
+                }
+            ]
+        },
+        {
+            "name": "Wooden Coffee Table",
+            "slug": "wooden-coffee-table",
+            "description": "A beautiful solid wood coffee table to complement your living room.",
+            "price": 199.99,
+            "stock": 8,
+            "categories": ["living-room"],
+            "images": [
+                {
+                    "image_url": "https://images.unsplash.com/photo-1499933374294-4584851497cc?ixlib=rb-4.0.3&auto=format&fit=crop&w=600&h=600&q=80",
+                    "is_primary": True
+                }
+            ]
+        },
+        {
+            "name": "Modern Bookshelf",
+            "slug": "modern-bookshelf",
+            "description": "A spacious bookshelf with a modern design perfect for your books and decor.",
+            "price": 249.99,
+            "stock": 5,
+            "categories": ["living-room", "office"],
+            "images": [
+                {
+                    "image_url": "https://images.unsplash.com/photo-1593085260707-5377ba37f868?ixlib=rb-4.0.3&auto=format&fit=crop&w=600&h=600&q=80",
+                    "is_primary": True
+                }
+            ]
+        },
+        {
+            "name": "King Size Bed Frame",
+            "slug": "king-size-bed-frame",
+            "description": "A sturdy and elegant king size bed frame for your bedroom.",
+            "price": 599.99,
+            "stock": 3,
+            "categories": ["bedroom"],
+            "images": [
+                {
+                    "image_url": "https://images.unsplash.com/photo-1588046130717-0eb0c9a3ba15?ixlib=rb-4.0.3&auto=format&fit=crop&w=600&h=600&q=80",
+                    "is_primary": True
+                }
+            ]
+        }
+    ]
+}
+
+# Vocabulary for generated products
+SYNTHETIC_STYLES = ["Modern", "Rustic", "Classic", "Nordic", "Industrial", "Vintage", "Minimalist", "Coastal"]
+SYNTHETIC_MATERIALS = ["Oak", "Walnut", "Pine", "Steel", "Velvet", "Leather", "Rattan", "Marble"]
+SYNTHETIC_ITEMS = ["Sofa", "Armchair", "Coffee Table", "Bookshelf", "Desk", "Office Chair", "Bed Frame", "Dresser", "Dining Table", "Bar Stool"]
+
+def load_fixture(path: Optional[str] = None) -> Dict[str, Any]:
+    """Sample fixture, or a JSON file with the same users/categories/products keys"""
+    if path is None:
+        return SAMPLE_FIXTURE
+    with open(path, encoding="utf-8") as stream:
+        fixture = json.load(stream)
+    fixture.setdefault("name", os.path.splitext(os.path.basename(path))[0])
+    return fixture
+
+def synthetic_products(count: int, category_slugs: List[str], seed: int = 0) -> Iterator[Dict[str, Any]]:
+    """Deterministic generated products, so reseeding yields the same catalog"""
+    rng = random.Random(seed)
+    image_urls = [image["image_url"] for product in SAMPLE_FIXTURE["products"] for image in product["images"]]
+    for number in range(1, count + 1):
+        name = f"{rng.choice(SYNTHETIC_STYLES)} {rng.choice(SYNTHETIC_MATERIALS)} {rng.choice(SYNTHETIC_ITEMS)}"
+        price = round(rng.uniform(20, 3000), 2)
+        yield {
+            "name": f"{name} {number}",
+            "slug": f"synthetic-{number:06d}",
+            "description": f"{name} from the generated load-test catalog.",
+            "price": price,
+            "sale_price": round(price * 0.8, 2) if rng.random() < 0.2 else None,
+            "stock": rng.randint(0, 50),
+            "categories": rng.sample(category_slugs, k=min(len(category_slugs), rng.randint(1, 2))),
+            "images": [{"image_url": rng.choice(image_urls), "is_primary": True}]
+        }
+
+def fixture_hash(fixture: Dict[str, Any], synthetic: int) -> str:
+    """Content hash of what a seed run would write; passwords are left out"""
+    content = {
+        "users": [{key: value for key, value in user.items() if key != "password"} for user in fixture.get("users", [])],
+        "categories": fixture.get("categories", []),
+        "products": fixture.get("products", []),
+        "synthetic": synthetic,
+    }
+    return hashlib.blake2b(json.dumps(content, sort_keys=True, default=str).encode(), digest_size=16).hexdigest()
+
+def _batches(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+async def seed_users(users: List[Dict[str, Any]]) -> int:
+    """Create missing users, hashing their passwords concurrently"""
+    existing = {user["email"] for user in await repo.users.project({"email": {"$in": [user["email"] for user in users]}}, ["email"])}
+    missing = [user for user in users if user["email"] not in existing]
+    # Hash a pool's worth at a time so large fixtures stay within its queue limit
+    hashes = []
+    for batch in _batches(missing, PASSWORD_WORKERS):
+        hashes.extend(await asyncio.gather(*[hash_password(user["password"]) for user in batch]))
+    now = datetime.utcnow()
+    await repo.users.insert_many([
+        User(
+            email=user["email"],
+            full_name=user["full_name"],
+            hashed_password=hashed,
+            is_admin=user.get("is_admin", False),
+            updated_at=now
+        )
+        for user, hashed in zip(missing, hashes)
+    ])
+    print(f"Users: {len(missing)} created, {len(existing)} already exist")
+    return len(missing)
+
+async def seed_categories(categories: List[Dict[str, Any]]) -> Dict[str, str]:
+    """Create missing categories and return every fixture category's id by slug"""
+    slugs = [category["slug"] for category in categories]
+    existing = {category["slug"]: category["_id"] for category in await repo.categories.project({"slug": {"$in": slugs}}, ["slug"])}
+    now = datetime.utcnow()
+    created = [
+        Category(**category, updated_at=now)
+        for category in categories
+        if category["slug"] not in existing
+    ]
+    await repo.categories.insert_many(created)
+    print(f"Categories: {len(created)} created, {len(existing)} already exist")
+    return {**existing, **{category.slug: category.id for category in created}}
+
+async def seed_products(products: Iterable[Dict[str, Any]], category_ids: Dict[str, str], batch_size: int = SEED_BATCH_SIZE) -> int:
+    """Create missing products and their images, one existence check and insert per batch"""
+    created = 0
+    skipped = 0
+    for batch in _batches(products, batch_size):
+        existing = {
+            product["slug"]
+            for product in await repo.products.project({"slug": {"$in": [data["slug"] for data in batch]}}, ["slug"])
+        }
+        now = datetime.utcnow()
+        new_products = []
+        new_images = []
+        for data in batch:
+            if data["slug"] in existing:
+                skipped += 1
+                continue
+            product = Product(
+                name=data["name"],
+                slug=data["slug"],
+                description=data["description"],
+                price=data["price"],
+                sale_price=data.get("sale_price"),
+                stock=data.get("stock", 0),
+                category_ids=[category_ids[slug] for slug in data.get("categories", []) if slug in category_ids],
+                updated_at=now
+            )
+            new_products.append(product)
+            new_images.extend(
+                ProductImage(
+                    product_id=product.id,
+                    image_url=image["image_url"],
+                    is_primary=image.get("is_primary", False),
+                    alt_text=image.get("alt_text", data["name"])
+                )
+                for image in data.get("images", [])
+            )
+        # Images only reference the product id, so both inserts can run at once
+        await asyncio.gather(repo.products.insert_many(new_products), repo.product_images.insert_many(new_images))
+        created += len(new_products)
+    print(f"Products: {created} created, {skipped} already exist")
+    return created
+
+async def _seed_catalog(fixture: Dict[str, Any], synthetic: int, batch_size: int):
+    category_ids = await seed_categories(fixture.get("categories", []))
+    products: Iterable[Dict[str, Any]] = fixture.get("products", [])
+    if synthetic:
+        # Chained rather than listed, so generated products are built a batch at a time
+        products = itertools.chain(products, synthetic_products(synthetic, [category["slug"] for category in fixture.get("categories", [])]))
+    await seed_products(products, category_ids, batch_size)
+
 # Add sample data
-async def seed_data():
+async def seed_data(
+    fixture_path: Optional[str] = SEED_FIXTURE,
+    synthetic: int = SEED_SYNTHETIC_PRODUCTS,
+    batch_size: int = SEED_BATCH_SIZE,
+    force: bool = False
+):
     # Import here to avoid circular imports
     from .database import init_db
     await init_db()
     
     try:
-        # Create admin user if it doesn't exist
-        admin_user = await User.find_one({"email": ADMIN_EMAIL})
-        if not admin_user:
-            admin_user = User(
-                email=ADMIN_EMAIL,
-                full_name="Admin User",
-                hashed_password=get_password_hash(ADMIN_PASSWORD),
-                is_admin=True
-            )
-            await admin_user.insert()
-            print("Admin user created")
-        else:
-            print("Admin user already exists")
+        fixture = load_fixture(fixture_path)
+        content_hash = fixture_hash(fixture, synthetic)
         
-        # Create test user if it doesn't exist
-        test_user = await User.find_one({"email": TEST_USER_EMAIL})
-        if not test_user:
-            test_user = User(
-                email=TEST_USER_EMAIL,
-                full_name="Test User",
-                hashed_password=get_password_hash(TEST_USER_PASSWORD),
-                is_admin=False
-            )
-            await test_user.insert()
-            print("Test user created")
-        else:
-            print("Test user already exists")
-        
-        # Create categories if they don't exist
-        categories = {
-            "living-room": "Living Room",
-            "bedroom": "Bedroom",
-            "office": "Office",
-            "kitchen": "Kitchen"
-        }
+        # Skip fixtures that were already applied unchanged
+        seed_run = await repo.seed_runs.get(fixture["name"])
+        if seed_run is not None and seed_run.content_hash == content_hash and not force:
+            print(f"Seed data '{fixture['name']}' unchanged, skipping")
+            return
         
-        created_categories = {}
-        
-        for slug, name in categories.items():
-            category = await Category.find_one({"slug": slug})
-            if not category:
-                category = Category(
-                    name=name,
-                    slug=slug,
-                    description=f"Furniture for your {name.lower()}",
-                    image_url=f"https://images.unsplash.com/photo-1556228453-efd6c1ff04f6?ixlib=rb-4.0.3&auto=format&fit=crop&w=400&h=300&q=80"
-                )
-                await category.insert()
-                print(f"Category '{name}' created")
-            else:
-                print(f"Category '{name}' already exists")
-            
-            created_categories[slug] = category
-        
-        # Create sample products if they don't exist
-        sample_products = [
-            {
-                "name": "Modern Sofa",
-                "slug": "modern-sofa",
-                "description": "A comfortable and stylish sofa perfect for any living room.",
-                "price": 899.99,
-                "stock": 10,
-                "categories": ["living-room"],
-                "images": [
-                    {
-                        "image_url": "https://images.unsplash.com/photo-1555041469-a586c61ea9bc?ixlib=rb-4.0.3&auto=format&fit=crop&w=600&h=600&q=80",
-                        "is_primary": True
-                    },
-                    {
-                        "image_url": "https://images.unsplash.com/photo-1507473885765-e6ed057f782c?ixlib=rb-4.0.3&auto=format&fit=crop&w=600&h=600&q=80",
-                        "is_primary": False
-                    }
-                ]
-            },
-            {
-                "name": "Ergonomic Office Chair",
-                "slug": "ergonomic-office-chair",
-                "description": "Experience ultimate comfort with our ergonomic office chair designed for long work hours.",
-                "price": 299.99,
-                "stock": 15,
-                "categories": ["office"],
-                "images": [
-                    {
-                        "image_url": "https://images.unsplash.com/photo-1580480055273-228ff5388ef8?ixlib=rb-4.0.3&auto=format&fit=crop&w=600&h=600&q=80",
-                        "is_primary": True
-                    },
-                    {
-                        "image_url": "https://images.unsplash.com/photo-1589384267710-7a170981ca78?ixlib=rb-4.0.3&auto=format&fit=crop&w=600&h=600&q=80",
-                        "is_primary": False
-                    }
-                ]
-            },
-            {
-                "name": "Wooden Coffee Table",
-                "slug": "wooden-coffee-table",
-                "description": "A beautiful solid wood coffee table to complement your living room.",
-                "price": 199.99,
-                "stock": 8,
-                "categories": ["living-room"],
-                "images": [
-                    {
-                        "image_url": "https://images.unsplash.com/photo-1499933374294-4584851497cc?ixlib=rb-4.0.3&auto=format&fit=crop&w=600&h=600&q=80",
-                        "is_primary": True
-                    }
-                ]
-            },
-            {
-                "name": "Modern Bookshelf",
-                "slug": "modern-bookshelf",
-                "description": "A spacious bookshelf with a modern design perfect for your books and decor.",
-                "price": 249.99,
-                "stock": 5,
-                "categories": ["living-room", "office"],
-                "images": [
-                    {
-                        "image_url": "https://images.unsplash.com/photo-1593085260707-5377ba37f868?ixlib=rb-4.0.3&auto=format&fit=crop&w=600&h=600&q=80",
-                        "is_primary": True
-                    }
-                ]
-            },
-            {
-                "name": "King Size Bed Frame",
-                "slug": "king-size-bed-frame",
-                "description": "A sturdy and elegant king size bed frame for your bedroom.",
-                "price": 599.99,
-                "stock": 3,
-                "categories": ["bedroom"],
-                "images": [
-                    {
-                        "image_url": "https://images.unsplash.com/photo-1588046130717-0eb0c9a3ba15?ixlib=rb-4.0.3&auto=format&fit=crop&w=600&h=600&q=80",
-                        "is_primary": True
-                    }
-                ]
-            }
-        ]
-        
-        for product_data in sample_products:
-            product = await Product.find_one({"slug": product_data["slug"]})
-            if not product:
-                # Get category IDs
-                category_ids = []
-                for category_slug in product_data["categories"]:
-                    if category_slug in created_categories:
-                        category_ids.append(created_categories[category_slug].id)
-                
-                # Create product
-                product = Product(
-                    name=product_data["name"],
-                    slug=product_data["slug"],
-                    description=product_data["description"],
-                    price=product_data["price"],
-                    stock=product_data["stock"],
-                    category_ids=category_ids
-                )
-                await product.insert()
-                
-                # Add images
-                for image_data in product_data["images"]:
-                    image = ProductImage(
-                        product_id=product.id,
-                        image_url=image_data["image_url"],
-                        is_primary=image_data.get("is_primary", False),
-                        alt_text=product_data["name"]
-                    )
-                    await image.insert()
-                
-                print(f"Product '{product_data['name']}' created")
-            else:
-                print(f"Product '{product_data['name']}' already exists")
+        # Users and the catalog do not depend on each other
+        await asyncio.gather(
+            seed_users(fixture.get("users", [])),
+            _seed_catalog(fixture, synthetic, batch_size)
+        )
         
+        if seed_run is None:
+            await repo.seed_runs.insert(SeedRun(id=fixture["name"], content_hash=content_hash))
+        else:
+            seed_run.content_hash = content_hash
+            seed_run.applied_at = datetime.utcnow()
+            await repo.seed_runs.replace(seed_run)
         print("Database initialized successfully")
     
     except Exception as e:
@@ -200,5 +308,14 @@ def init_db():
     loop = asyncio.get_event_loop()
     loop.run_until_complete(seed_data())
 
+def main():
+    parser = argparse.ArgumentParser(description="Seed the database with fixture and generated data")
+    parser.add_argument("--fixture", default=SEED_FIXTURE, help="JSON fixture to load instead of the sample data")
+    parser.add_argument("--synthetic", type=int, default=SEED_SYNTHETIC_PRODUCTS, help="number of generated products to add")
+    parser.add_argument("--batch-size", type=int, default=SEED_BATCH_SIZE)
+    parser.add_argument("--force", action="store_true", help="seed even if the fixture is unchanged")
+    args = parser.parse_args()
+    asyncio.run(seed_data(args.fixture, args.synthetic, args.batch_size, args.force))
+
 if __name__ == "__main__":
-    init_db() 
\ No newline at end of file
+    main()
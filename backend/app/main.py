@@ -1,7 +1,14 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from .database import init_db
-from .routers import products, users, auth, cart, orders
+from .routers import products, users, auth, cart, guest_cart, orders
+from .utils.category_index import category_index
+from .utils.search import product_search_index
+from .utils.metrics import registry
+from .utils.profiling import DBProfilingMiddleware
+from .utils.telemetry import RequestMetricsMiddleware, monitor_loop_lag
+import asyncio
 import logging
 
 # Configure logging
@@ -25,25 +32,41 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Per-request database timing (Server-Timing header and /metrics)
+app.add_middleware(DBProfilingMiddleware)
+
+# Request counts, latency and in-flight gauges per route (/metrics)
+app.add_middleware(RequestMetricsMiddleware)
+
 # Include routers
 app.include_router(auth.router, prefix="/api", tags=["Authentication"])
 app.include_router(users.router, prefix="/api/users", tags=["Users"])
 app.include_router(products.router, prefix="/api/products", tags=["Products"])
 app.include_router(cart.router, prefix="/api/cart", tags=["Cart"])
+app.include_router(guest_cart.router, prefix="/api/guest-cart", tags=["Cart"])
 app.include_router(orders.router, prefix="/api/orders", tags=["Orders"])
 
 @app.get("/api/health", tags=["Health"])
 async def health_check():
     return {"status": "ok", "message": "API is running"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.on_event("startup")
 async def startup_db_client():
     logger.info("Connecting to MongoDB...")
     await init_db()
     logger.info("Connected to MongoDB!")
+    await product_search_index.rebuild()
+    await category_index.rebuild()
+    app.state.loop_lag_monitor = asyncio.create_task(monitor_loop_lag())
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    app.state.loop_lag_monitor.cancel()
     logger.info("Disconnecting from MongoDB...") 
\ No newline at end of file
@@ -0,0 +1,75 @@
+import sys
+import asyncio
+from datetime import datetime
+from pymongo import UpdateOne
+from . import repositories as repo
+
+# Users migrated per batch
+BATCH_SIZE = 500
+
+# Fold cart_items documents into one embedded-line cart per user
+async def embed_cart_lines(batch_size: int = BATCH_SIZE):
+    # Import here to avoid circular imports
+    from .database import init_db
+    await init_db()
+
+    migrated = 0
+    lines_moved = 0
+    last_user_id = ""
+
+    while True:
+        # Page by user so each batch reads every line of the carts it touches
+        user_ids = [
+            row["_id"] for row in await repo.cart_items.aggregate([
+                {"$match": {"user_id": {"$gt": last_user_id}}},
+                {"$group": {"_id": "$user_id"}},
+                {"$sort": {"_id": 1}},
+                {"$limit": batch_size}
+            ])
+        ]
+        if not user_ids:
+            break
+        last_user_id = user_ids[-1]
+
+        items, carts = await asyncio.gather(
+            repo.cart_items.group_by("user_id", user_ids),
+            repo.carts.find_by_ids(user_ids)
+        )
+
+        now = datetime.utcnow()
+        operations = []
+        for user_id in user_ids:
+            # Lines already in the new cart win, so rerunning adds nothing
+            cart = carts.get(user_id)
+            in_cart = {line.product_id for line in cart.lines} if cart else set()
+            lines = [
+                {"id": item.id, "product_id": item.product_id, "quantity": item.quantity, "added_at": item.added_at}
+                for item in sorted(items[user_id], key=lambda item: item.added_at)
+                if item.product_id not in in_cart
+            ]
+            if not lines:
+                continue
+            operations.append(UpdateOne(
+                {"_id": user_id},
+                {"$push": {"lines": {"$each": lines}}, "$set": {"updated_at": now}},
+                upsert=True
+            ))
+            lines_moved += len(lines)
+
+        if operations:
+            await repo.carts.bulk_write(operations)
+            migrated += len(operations)
+        print(f"Migrated {migrated} carts so far")
+
+    print(f"Cart migration completed: {migrated} carts updated, {lines_moved} lines embedded")
+
+def migrate():
+    """Function to run the async migration from sync code"""
+    try:
+        asyncio.run(embed_cart_lines())
+    except Exception as e:
+        print(f"Error migrating carts: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,74 @@
+import sys
+import asyncio
+from pymongo import UpdateOne
+from . import repositories as repo
+from .utils.snapshots import address_snapshot, load_images, order_line
+
+# Orders migrated per batch
+BATCH_SIZE = 500
+
+# Backfill embedded address and line snapshots into existing orders
+async def embed_order_lines(batch_size: int = BATCH_SIZE):
+    # Import here to avoid circular imports
+    from .database import init_db
+    await init_db()
+
+    migrated = 0
+    skipped = 0
+    last_id = ""
+
+    while True:
+        # Page by _id so already-migrated orders are never rescanned
+        orders = await repo.orders.find_many(
+            {"_id": {"$gt": last_id}, "$or": [{"items": None}, {"address": None}]},
+            sort=[("_id", 1)], limit=batch_size
+        )
+        if not orders:
+            break
+        last_id = orders[-1].id
+
+        # Load everything the batch references with one query per collection
+        items_by_order = await repo.order_items.group_by("order_id", (order.id for order in orders))
+        product_ids = {item.product_id for items in items_by_order.values() for item in items}
+        products = await repo.products.find_by_ids(product_ids)
+        addresses = await repo.addresses.find_by_ids(order.address_id for order in orders)
+        images = await load_images(product_ids)
+
+        operations = []
+        for order in orders:
+            address = addresses.get(order.address_id)
+            items = items_by_order.get(order.id, [])
+            if address is None or any(item.product_id not in products for item in items):
+                # Leave orders with dangling references on the referenced path
+                skipped += 1
+                continue
+            lines = [
+                order_line(products[item.product_id], images.get(item.product_id, []),
+                           item.quantity, item.price, id=item.id)
+                for item in items
+            ]
+            operations.append(UpdateOne(
+                {"_id": order.id},
+                {"$set": {
+                    "address": address_snapshot(address).model_dump(),
+                    "items": [line.model_dump() for line in lines]
+                }}
+            ))
+
+        if operations:
+            await repo.orders.bulk_write(operations)
+            migrated += len(operations)
+        print(f"Embedded {migrated} orders so far")
+
+    print(f"Order migration completed: {migrated} embedded, {skipped} skipped")
+
+def migrate():
+    """Function to run the async migration from sync code"""
+    try:
+        asyncio.run(embed_order_lines())
+    except Exception as e:
+        print(f"Error migrating orders: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    migrate()
@@ -1,8 +1,10 @@
 from beanie import Document, Link, before_event, Insert, Replace
-from typing import List, Optional, Union
-from pydantic import Field, EmailStr
+from typing import Dict, List, Optional, Union
+from pydantic import BaseModel, Field, EmailStr
+from pymongo import IndexModel, ASCENDING, DESCENDING
 from datetime import datetime
 import uuid
+from .utils.cache import invalidate_product, invalidate_user
 
 # Generate a UUID for new documents
 def generate_id() -> str:
@@ -24,6 +26,12 @@ class User(Document):
             "email",
             "is_admin"
         ]
+    
+    # Set updated_at automatically and drop the cached principal
+    @before_event(Insert, Replace)
+    def set_user_updated_at(self):
+        self.updated_at = datetime.utcnow()
+        invalidate_user(self.id)
 
 class Address(Document):
     id: str = Field(default_factory=generate_id)
@@ -48,12 +56,18 @@ class Category(Document):
     slug: str
     description: Optional[str] = None
     image_url: Optional[str] = None
+    updated_at: Optional[datetime] = None
     
     class Settings:
         name = "categories"
         indexes = [
             "slug",
         ]
+    
+    # Set updated_at automatically
+    @before_event(Insert, Replace)
+    def set_category_updated_at(self):
+        self.updated_at = datetime.utcnow()
 
 class ProductImage(Document):
     id: str = Field(default_factory=generate_id)
@@ -68,6 +82,16 @@ class ProductImage(Document):
             "product_id",
         ]
 
+# Review totals kept on each product; the histogram is keyed by star rating
+def empty_histogram() -> Dict[str, int]:
+    return {str(stars): 0 for stars in range(1, 6)}
+
+class RatingSummary(BaseModel):
+    count: int = 0
+    sum: int = 0
+    average: float = 0.0
+    histogram: Dict[str, int] = Field(default_factory=empty_histogram)
+
 class Product(Document):
     id: str = Field(default_factory=generate_id)
     name: str
@@ -80,14 +104,58 @@ class Product(Document):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: Optional[datetime] = None
     category_ids: List[str] = []
+    rating: RatingSummary = Field(default_factory=RatingSummary)
     
     class Settings:
         name = "products"
         indexes = [
             "slug",
-            "category_ids"
+            # Lets workers pull recent changes into their search index
+            "updated_at",
+            # Keyset pagination over the active catalog
+            IndexModel([("is_active", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+            # Category listings, newest first; also serves any lookup by category_ids
+            IndexModel([("category_ids", ASCENDING), ("is_active", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("is_active", ASCENDING), ("price", ASCENDING), ("_id", ASCENDING)]),
+            IndexModel([("is_active", ASCENDING), ("name", ASCENDING), ("_id", ASCENDING)]),
+            IndexModel([("is_active", ASCENDING), ("rating.average", ASCENDING), ("_id", ASCENDING)])
         ]
+    
+    # Set updated_at automatically and drop any cached copy
+    @before_event(Insert, Replace)
+    def set_product_updated_at(self):
+        self.updated_at = datetime.utcnow()
+        invalidate_product(self.id, self.slug)
+
+class CartLine(BaseModel):
+    id: str = Field(default_factory=generate_id)
+    product_id: str
+    quantity: int = 1
+    added_at: datetime = Field(default_factory=datetime.utcnow)
 
+class Cart(Document):
+    # One cart per user, keyed by the user's id, with its lines embedded
+    id: str
+    lines: List[CartLine] = []
+    updated_at: Optional[datetime] = None
+    
+    class Settings:
+        name = "carts"
+
+class GuestCart(Document):
+    # Keyed by a digest of the guest's token; removed by MongoDB once expires_at passes
+    id: str
+    lines: List[CartLine] = []
+    updated_at: Optional[datetime] = None
+    expires_at: datetime
+    
+    class Settings:
+        name = "guest_carts"
+        indexes = [
+            IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0)
+        ]
+
+# One document per cart line; superseded by Cart and kept for migrate_carts
 class CartItem(Document):
     id: str = Field(default_factory=generate_id)
     user_id: str
@@ -98,8 +166,8 @@ class CartItem(Document):
     class Settings:
         name = "cart_items"
         indexes = [
-            "user_id",
-            "product_id"
+            # One line per product per cart; also serves cart reads by user_id
+            IndexModel([("user_id", ASCENDING), ("product_id", ASCENDING)], unique=True)
         ]
 
 class OrderItem(Document):
@@ -115,6 +183,42 @@ class OrderItem(Document):
             "order_id",
         ]
 
+# Snapshots embedded in orders so history does not depend on current rows
+class AddressSnapshot(BaseModel):
+    id: str
+    user_id: str
+    address_line1: str
+    address_line2: Optional[str] = None
+    city: str
+    state: str
+    postal_code: str
+    country: str
+    is_default: bool = False
+
+class ProductImageSnapshot(BaseModel):
+    id: str
+    product_id: str
+    image_url: str
+    alt_text: Optional[str] = None
+    is_primary: bool = False
+
+class ProductSnapshot(BaseModel):
+    id: str
+    name: str
+    slug: str
+    description: str
+    price: float
+    sale_price: Optional[float] = None
+    created_at: datetime
+    images: List[ProductImageSnapshot] = []
+
+class OrderLine(BaseModel):
+    id: str = Field(default_factory=generate_id)
+    product_id: str
+    quantity: int
+    price: float
+    product: ProductSnapshot
+
 class Order(Document):
     id: str = Field(default_factory=generate_id)
     user_id: str
@@ -123,13 +227,24 @@ class Order(Document):
     status: str = "pending"  # pending, processing, shipped, delivered, cancelled
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: Optional[datetime] = None
+    # Embedded storage mode: address and lines copied in at checkout
+    address: Optional[AddressSnapshot] = None
+    items: Optional[List[OrderLine]] = None
     
     class Settings:
         name = "orders"
         indexes = [
-            "user_id",
-            "status"
+            # Keyset pagination for order history and the admin list
+            IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+            # Admin list filtered by status
+            IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)])
         ]
+    
+    # Set updated_at automatically
+    @before_event(Insert, Replace)
+    def set_order_updated_at(self):
+        self.updated_at = datetime.utcnow()
 
 class Review(Document):
     id: str = Field(default_factory=generate_id)
@@ -143,26 +258,22 @@ class Review(Document):
     class Settings:
         name = "reviews"
         indexes = [
-            "user_id",
-            "product_id"
+            # One review per user per product
+            IndexModel([("product_id", ASCENDING), ("user_id", ASCENDING)], unique=True),
+            # Keyset pagination for a product's reviews
+            IndexModel([("product_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)])
         ]
+    
+    # Set updated_at automatically
+    @before_event(Insert, Replace)
+    def set_review_updated_at(self):
+        self.updated_at = datetime.utcnow()
 
-# Update user model to set updated_at automatically
-@before_event([User], Insert, Replace)
-def set_user_updated_at(user: User):
-    user.updated_at = datetime.utcnow()
-
-# Update product model to set updated_at automatically
-@before_event([Product], Insert, Replace)
-def set_product_updated_at(product: Product):
-    product.updated_at = datetime.utcnow()
-
-# Update order model to set updated_at automatically
-@before_event([Order], Insert, Replace)
-def set_order_updated_at(order: Order):
-    order.updated_at = datetime.utcnow()
-
-# Update review model to set updated_at automatically  
-@before_event([Review], Insert, Replace)
-def set_review_updated_at(review: Review):
-    review.updated_at = datetime.utcnow() 
\ No newline at end of file
+class SeedRun(Document):
+    # Fixture name
+    id: str
+    content_hash: str
+    applied_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "seed_runs"
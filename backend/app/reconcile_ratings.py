@@ -0,0 +1,70 @@
+import sys
+import asyncio
+from datetime import datetime
+from pymongo import UpdateOne
+from . import repositories as repo
+from .models import empty_histogram
+
+# Products written per bulk update
+BATCH_SIZE = 1000
+
+def _summary(histogram):
+    count = sum(histogram.values())
+    total = sum(int(stars) * votes for stars, votes in histogram.items())
+    return {
+        "count": count,
+        "sum": total,
+        "average": round(total / count, 4) if count else 0.0,
+        "histogram": histogram,
+    }
+
+# Rebuild every product's rating summary from the reviews collection
+async def rebuild_ratings(batch_size: int = BATCH_SIZE):
+    # Import here to avoid circular imports
+    from .database import init_db
+    await init_db()
+
+    # Count reviews per product and star rating in one pass
+    histograms = {}
+    rows = await repo.reviews.aggregate([
+        {"$group": {"_id": {"product_id": "$product_id", "rating": "$rating"}, "count": {"$sum": 1}}}
+    ])
+    for row in rows:
+        histogram = histograms.setdefault(row["_id"]["product_id"], empty_histogram())
+        histogram[str(row["_id"]["rating"])] = row["count"]
+
+    checked = 0
+    corrected = 0
+    operations = []
+    now = datetime.utcnow()
+    for product in await repo.products.project({}, ["rating"]):
+        checked += 1
+        expected = _summary(histograms.get(product["_id"], empty_histogram()))
+        # Leave products that are already right alone so their ETags stay valid
+        if product.get("rating") == expected:
+            continue
+        operations.append(UpdateOne(
+            {"_id": product["_id"]},
+            {"$set": {"rating": expected, "updated_at": now}}
+        ))
+        if len(operations) >= batch_size:
+            await repo.products.bulk_write(operations)
+            corrected += len(operations)
+            operations = []
+
+    if operations:
+        await repo.products.bulk_write(operations)
+        corrected += len(operations)
+
+    print(f"Rating reconciliation completed: {checked} products checked, {corrected} corrected")
+
+def reconcile():
+    """Function to run the async reconciliation from sync code"""
+    try:
+        asyncio.run(rebuild_ratings())
+    except Exception as e:
+        print(f"Error reconciling ratings: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    reconcile()
@@ -0,0 +1,160 @@
+from typing import Any, Dict, Generic, Iterable, List, Optional, Sequence, Tuple, Type, TypeVar
+from beanie import Document
+from pymongo import ReturnDocument
+from .models import (
+    User, Address, Category, Product, ProductImage, Cart, GuestCart, CartItem, Order, OrderItem, Review, SeedRun
+)
+
+DocType = TypeVar("DocType", bound=Document)
+
+# Sort spec as (field, direction) pairs, e.g. [("created_at", -1), ("_id", -1)]
+SortSpec = Sequence[Tuple[str, int]]
+
+class Repository(Generic[DocType]):
+    """Async data access for a single Beanie document model
+
+    Routers go through these methods instead of building queries on the
+    models directly, so every read and write is awaited on the event loop
+    and bulk operations are available in one place.
+    """
+
+    def __init__(self, model: Type[DocType], timestamp_field: Optional[str] = None):
+        self.model = model
+        # Field bumped on every write, for revalidating listings; None for append-only collections
+        self.timestamp_field = timestamp_field
+
+    @property
+    def collection(self):
+        """The underlying Motor collection"""
+        return self.model.get_motor_collection()
+
+    # Finders
+    async def get(self, document_id: str, **filters) -> Optional[DocType]:
+        return await self.model.find_one({"_id": document_id, **filters})
+
+    async def find_one(self, filters: Dict[str, Any], session=None) -> Optional[DocType]:
+        return await self.model.find_one(filters, session=session)
+
+    async def find_many(
+        self,
+        filters: Dict[str, Any],
+        sort: Optional[SortSpec] = None,
+        skip: int = 0,
+        limit: int = 0,
+        session=None
+    ) -> List[DocType]:
+        query = self.model.find(filters, session=session)
+        if sort:
+            query = query.sort(list(sort))
+        if skip:
+            query = query.skip(skip)
+        if limit:
+            query = query.limit(limit)
+        return await query.to_list()
+
+    async def find_by_ids(self, ids: Iterable[str], **filters) -> Dict[str, DocType]:
+        """Documents for a set of ids in one $in query, keyed by id"""
+        ids = list(set(ids))
+        if not ids:
+            return {}
+        documents = await self.find_many({"_id": {"$in": ids}, **filters})
+        return {document.id: document for document in documents}
+
+    async def group_by(self, field: str, values: Iterable[Any]) -> Dict[Any, List[DocType]]:
+        """Documents whose field is in values, grouped by that field"""
+        values = list(set(values))
+        grouped: Dict[Any, List[DocType]] = {value: [] for value in values}
+        if values:
+            for document in await self.find_many({field: {"$in": values}}):
+                grouped[getattr(document, field)].append(document)
+        return grouped
+
+    async def project(
+        self,
+        filters: Dict[str, Any],
+        fields: Iterable[str],
+        sort: Optional[SortSpec] = None,
+        limit: int = 0
+    ) -> List[Dict[str, Any]]:
+        """Raw documents restricted to the given fields"""
+        cursor = self.collection.find(filters, {field: 1 for field in fields})
+        if sort:
+            cursor = cursor.sort(list(sort))
+        if limit:
+            cursor = cursor.limit(limit)
+        return await cursor.to_list(length=None)
+
+    async def exists(self, filters: Dict[str, Any]) -> bool:
+        return await self.collection.find_one(filters, {"_id": 1}) is not None
+
+    async def count(self, filters: Dict[str, Any]) -> int:
+        return await self.collection.count_documents(filters)
+
+    async def estimated_count(self) -> int:
+        """Whole-collection count from metadata, without scanning"""
+        return await self.collection.estimated_document_count()
+
+    async def aggregate(self, pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return await self.model.aggregate(pipeline).to_list()
+
+    # Writers
+    async def insert(self, document: DocType, session=None) -> DocType:
+        return await document.insert(session=session)
+
+    async def insert_many(self, documents: List[DocType], session=None):
+        if documents:
+            await self.model.insert_many(documents, session=session)
+
+    async def replace(self, document: DocType, session=None) -> DocType:
+        """Write back a changed document, running its Replace hooks"""
+        return await document.replace(session=session)
+
+    async def update_one(self, filters: Dict[str, Any], update: Dict[str, Any], session=None) -> bool:
+        result = await self.collection.update_one(filters, update, session=session)
+        return result.matched_count > 0
+
+    async def update_many(self, filters: Dict[str, Any], update: Dict[str, Any], session=None) -> int:
+        result = await self.collection.update_many(filters, update, session=session)
+        return result.modified_count
+
+    async def find_one_and_update(
+        self,
+        filters: Dict[str, Any],
+        update: Dict[str, Any],
+        projection: Optional[Dict[str, Any]] = None,
+        upsert: bool = False,
+        session=None
+    ) -> Optional[Dict[str, Any]]:
+        """Atomically update (or upsert) one document and return it after the update"""
+        return await self.collection.find_one_and_update(
+            filters, update, projection=projection, upsert=upsert,
+            return_document=ReturnDocument.AFTER, session=session
+        )
+
+    async def find_one_and_delete(self, filters: Dict[str, Any], session=None) -> Optional[Dict[str, Any]]:
+        """Atomically delete one document and return it as it was"""
+        return await self.collection.find_one_and_delete(filters, session=session)
+
+    async def delete(self, document: DocType, session=None):
+        await document.delete(session=session)
+
+    async def delete_many(self, filters: Dict[str, Any], session=None) -> int:
+        result = await self.collection.delete_many(filters, session=session)
+        return result.deleted_count
+
+    async def bulk_write(self, operations: List[Any], ordered: bool = False, session=None):
+        if operations:
+            return await self.collection.bulk_write(operations, ordered=ordered, session=session)
+
+users = Repository(User, timestamp_field="updated_at")
+addresses = Repository(Address)
+categories = Repository(Category, timestamp_field="updated_at")
+products = Repository(Product, timestamp_field="updated_at")
+product_images = Repository(ProductImage)
+carts = Repository(Cart, timestamp_field="updated_at")
+guest_carts = Repository(GuestCart, timestamp_field="updated_at")
+cart_items = Repository(CartItem)
+orders = Repository(Order, timestamp_field="updated_at")
+order_items = Repository(OrderItem)
+reviews = Repository(Review, timestamp_field="updated_at")
+seed_runs = Repository(SeedRun)
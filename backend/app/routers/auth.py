@@ -1,19 +1,20 @@
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from ..utils.auth import authenticate_user, create_access_token, get_password_hash, ACCESS_TOKEN_EXPIRE_MINUTES
-from ..database import get_db
+from ..utils.auth import authenticate_user, create_access_token, hash_password, ACCESS_TOKEN_EXPIRE_MINUTES
+from ..utils.carts import merge_guest_cart
+from .. import repositories as repo
 from ..models import User
 from ..schemas import UserCreate, Token, UserResponse
 
 router = APIRouter()
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate):
     """Register a new user"""
     # Check if user already exists
-    db_user = db.query(User).filter(User.email == user.email).first()
+    db_user = await repo.users.find_one({"email": user.email})
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -21,21 +22,22 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await hash_password(user.password)
     db_user = User(
         email=user.email,
         full_name=user.full_name,
         hashed_password=hashed_password
     )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await repo.users.insert(db_user)
     return db_user
 
 @router.post("/login", response_model=Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    """Login to get access token"""
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login_for_access_token(
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    x_guest_cart: Optional[str] = Header(None)
+):
+    """Login to get access token, moving any guest cart into the user's cart"""
+    user = await authenticate_user(form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -48,4 +50,8 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
         data={"sub": str(user.id)},
         expires_delta=access_token_expires
     )
+    
+    if x_guest_cart:
+        await merge_guest_cart(x_guest_cart, user.id)
+    
     return {"access_token": access_token, "token_type": "bearer"} 
\ No newline at end of file
@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Depends, status
+from typing import List
+from ..schemas import CartItemCreate, CartItemResponse, CartItemUpdate, GuestCartSession
+from ..utils.carts import CartStore, create_guest_cart, get_guest_cart
+from ..utils.loaders import ResponseLoader, get_response_loader
+from ..utils.responses import fast_json
+
+router = APIRouter()
+
+@router.post("/session", response_model=GuestCartSession, status_code=status.HTTP_201_CREATED)
+async def start_guest_cart():
+    """Start a guest cart; send the returned token in the X-Guest-Cart header"""
+    return await create_guest_cart()
+
+@router.get("/", response_model=List[CartItemResponse])
+async def read_guest_cart(
+    loader: ResponseLoader = Depends(get_response_loader),
+    cart: CartStore = Depends(get_guest_cart)
+):
+    """Get the guest's cart items with current prices and stock"""
+    return fast_json(List[CartItemResponse], await loader.load_cart(await cart.lines()))
+
+@router.post("/", response_model=CartItemResponse, status_code=status.HTTP_201_CREATED)
+async def add_to_guest_cart(
+    item: CartItemCreate,
+    loader: ResponseLoader = Depends(get_response_loader),
+    cart: CartStore = Depends(get_guest_cart)
+):
+    """Add a product to the guest cart"""
+    line = await cart.add(item.product_id, item.quantity)
+    return (await loader.load_cart([line]))[0]
+
+@router.put("/{item_id}", response_model=CartItemResponse)
+async def update_guest_cart_item(
+    item_id: str,
+    item_update: CartItemUpdate,
+    loader: ResponseLoader = Depends(get_response_loader),
+    cart: CartStore = Depends(get_guest_cart)
+):
+    """Update the quantity of a guest cart item"""
+    line = await cart.update(item_id, item_update.quantity)
+    return (await loader.load_cart([line]))[0]
+
+@router.delete("/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def remove_from_guest_cart(item_id: str, cart: CartStore = Depends(get_guest_cart)):
+    """Remove an item from the guest cart"""
+    await cart.remove(item_id)
+    return None
+
+@router.delete("/", status_code=status.HTTP_204_NO_CONTENT)
+async def clear_guest_cart(cart: CartStore = Depends(get_guest_cart)):
+    """Clear the entire guest cart"""
+    await cart.clear()
+    return None
@@ -1,25 +1,73 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from ..database import get_db
-from ..models import User, Order, OrderItem, Product, Address, CartItem
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from typing import Dict, List, Optional
+from datetime import datetime
+import os
+from .. import repositories as repo
+from ..database import in_transaction, supports_transactions
+from ..models import User, Order, OrderItem, Product
 from ..schemas import OrderCreate, OrderResponse
 from ..utils.auth import get_current_active_user, get_current_admin_user
+from ..utils.pagination import NEXT_CURSOR_HEADER, cursor_filter, next_cursor
+from ..utils.inventory import InsufficientStock, merge_lines, reserve_stock, release_stock
+from ..utils.loaders import ResponseLoader, get_response_loader
+from ..utils.snapshots import address_snapshot, load_images, order_line
 
 router = APIRouter()
 
+# "embedded" stores the address and lines inside each new order,
+# "referenced" keeps them in the addresses/order_items collections
+ORDER_STORAGE = os.environ.get("ORDER_STORAGE", "referenced")
+
+# Newest orders first, with _id as the tiebreaker for keyset pagination
+ORDER_SORT = [("created_at", -1), ("_id", -1)]
+
+async def _order_lines(order: Order) -> Dict[str, int]:
+    """Quantities per product for an order"""
+    items = order.items
+    if items is None:
+        items = await repo.order_items.find_many({"order_id": order.id})
+    return merge_lines((item.product_id, item.quantity) for item in items)
+
+async def _reserve_or_400(lines: Dict[str, int], products: Optional[Dict[str, Product]] = None, session=None):
+    """Reserve stock, turning a shortfall into a 400 response"""
+    try:
+        await reserve_stock(lines, session)
+    except InsufficientStock as e:
+        product = (products or {}).get(e.product_id) or await repo.products.get(e.product_id)
+        name = product.name if product else e.product_id
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Not enough stock for product '{name}'. Requested: {e.quantity}"
+        )
+
+async def _change_status(order_id: str, current: str, new: str, session=None) -> Optional[Order]:
+    """Move an order from one status to another, or return None if it has moved on
+
+    Only one of several concurrent changes from the same status matches,
+    so stock is reserved or released at most once per transition.
+    """
+    doc = await repo.orders.find_one_and_update(
+        {"_id": order_id, "status": current},
+        {"$set": {"status": new, "updated_at": datetime.utcnow()}},
+        session=session
+    )
+    return Order.model_validate(doc) if doc is not None else None
+
+def _status_conflict(order: Order) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"Order status changed from '{order.status}' while updating; reload and try again"
+    )
+
 @router.post("/", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
 async def create_order(
     order: OrderCreate,
-    db: Session = Depends(get_db),
+    loader: ResponseLoader = Depends(get_response_loader),
     current_user: User = Depends(get_current_active_user)
 ):
     """Create a new order"""
     # Check if address exists and belongs to current user
-    address = db.query(Address).filter(
-        Address.id == order.address_id,
-        Address.user_id == current_user.id
-    ).first()
+    address = await repo.addresses.get(order.address_id, user_id=current_user.id)
     
     if address is None:
         raise HTTPException(
@@ -27,15 +75,17 @@ async def create_order(
             detail="Invalid address or address doesn't belong to current user"
         )
     
+    # Load every ordered product in one query
+    products = await repo.products.find_by_ids(
+        (item.product_id for item in order.items), is_active=True
+    )
+    
     # Validate each order item
     total_amount = 0
     order_items_data = []
     
     for item in order.items:
-        product = db.query(Product).filter(
-            Product.id == item.product_id,
-            Product.is_active == True
-        ).first()
+        product = products.get(item.product_id)
         
         if product is None:
             raise HTTPException(
@@ -43,12 +93,6 @@ async def create_order(
                 detail=f"Product with ID {item.product_id} not found or is inactive"
             )
         
-        if product.stock < item.quantity:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Not enough stock for product '{product.name}'. Available: {product.stock}, Requested: {item.quantity}"
-            )
-        
         # Calculate item price (use sale_price if available)
         price = product.sale_price if product.sale_price else product.price
         item_total = price * item.quantity
@@ -59,85 +103,106 @@ async def create_order(
             "quantity": item.quantity,
             "price": price
         })
-        
-        # Update stock
-        product.stock -= item.quantity
-        
-    # Create order
+    
+    # Take stock for all lines atomically
+    reserved = merge_lines((item["product_id"], item["quantity"]) for item in order_items_data)
+    await _reserve_or_400(reserved, products)
+    
     db_order = Order(
         user_id=current_user.id,
         address_id=address.id,
         total_amount=total_amount,
         status="pending"
     )
-    db.add(db_order)
-    db.commit()
-    db.refresh(db_order)
-    
-    # Create order items
-    for item_data in order_items_data:
-        db_order_item = OrderItem(
-            order_id=db_order.id,
-            product_id=item_data["product_id"],
-            quantity=item_data["quantity"],
-            price=item_data["price"]
+    db_order_items = []
+    if ORDER_STORAGE == "embedded":
+        # Copy the address and what was sold into the order itself
+        images = await load_images(products)
+        db_order.address = address_snapshot(address)
+        db_order.items = [
+            order_line(products[item_data["product_id"]], images.get(item_data["product_id"], []),
+                       item_data["quantity"], item_data["price"])
+            for item_data in order_items_data
+        ]
+    else:
+        db_order_items = [OrderItem(order_id=db_order.id, **item_data) for item_data in order_items_data]
+    
+    # Write the order, its items and the cart clear together
+    async def write(session):
+        await repo.orders.insert(db_order, session=session)
+        await repo.order_items.insert_many(db_order_items, session=session)
+        # Clear the cart (optional - can be controlled by frontend)
+        await repo.carts.update_one(
+            {"_id": current_user.id},
+            {"$set": {"lines": [], "updated_at": datetime.utcnow()}},
+            session=session
         )
-        db.add(db_order_item)
     
-    # Clear the cart (optional - can be controlled by frontend)
-    db.query(CartItem).filter(CartItem.user_id == current_user.id).delete()
+    try:
+        await in_transaction(write)
+    except Exception:
+        # Standalone servers have no transaction to roll back, so undo by hand
+        if not await supports_transactions():
+            await repo.order_items.delete_many({"order_id": db_order.id})
+            await repo.orders.delete_many({"_id": db_order.id})
+        # Give the stock back since the order was not written
+        await release_stock(reserved)
+        raise
     
-    db.commit()
-    db.refresh(db_order)
-    return db_order
+    return (await loader.load_orders([db_order]))[0]
 
 @router.get("/", response_model=List[OrderResponse])
 async def read_user_orders(
-    skip: int = 0,
-    limit: int = 10,
-    db: Session = Depends(get_db),
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    loader: ResponseLoader = Depends(get_response_loader),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get all orders for the current user"""
-    orders = db.query(Order).filter(Order.user_id == current_user.id).order_by(
-        Order.created_at.desc()
-    ).offset(skip).limit(limit).all()
-    return orders
+    query = {"user_id": current_user.id, **cursor_filter(cursor, "created_at", -1)}
+    orders = await repo.orders.find_many(query, sort=ORDER_SORT, skip=0 if cursor else skip, limit=limit)
+    
+    cursor_value = next_cursor(orders, "created_at", -1, limit)
+    if cursor_value:
+        response.headers[NEXT_CURSOR_HEADER] = cursor_value
+    return await loader.load_orders(orders)
 
 @router.get("/{order_id}", response_model=OrderResponse)
 async def read_user_order(
-    order_id: int,
-    db: Session = Depends(get_db),
+    order_id: str,
+    loader: ResponseLoader = Depends(get_response_loader),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get details of a specific order"""
-    query = db.query(Order).filter(Order.id == order_id)
+    query = {"_id": order_id}
     
     # Non-admin users can only view their own orders
     if not current_user.is_admin:
-        query = query.filter(Order.user_id == current_user.id)
+        query["user_id"] = current_user.id
     
-    order = query.first()
+    order = await repo.orders.find_one(query)
     
     if order is None:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    return order
+    return (await loader.load_orders([order]))[0]
 
 @router.put("/{order_id}/cancel", response_model=OrderResponse)
 async def cancel_order(
-    order_id: int,
-    db: Session = Depends(get_db),
+    order_id: str,
+    loader: ResponseLoader = Depends(get_response_loader),
     current_user: User = Depends(get_current_active_user)
 ):
     """Cancel an order"""
-    query = db.query(Order).filter(Order.id == order_id)
+    query = {"_id": order_id}
     
     # Non-admin users can only cancel their own orders
     if not current_user.is_admin:
-        query = query.filter(Order.user_id == current_user.id)
+        query["user_id"] = current_user.id
     
-    order = query.first()
+    order = await repo.orders.find_one(query)
     
     if order is None:
         raise HTTPException(status_code=404, detail="Order not found")
@@ -149,76 +214,90 @@ async def cancel_order(
             detail=f"Cannot cancel order with status '{order.status}'"
         )
     
-    # Update order status
-    order.status = "cancelled"
+    lines = await _order_lines(order)
     
-    # Restore stock
-    for item in order.items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        if product:
-            product.stock += item.quantity
+    # Flip the status only if it is still pending and restore stock with it
+    async def write(session):
+        cancelled = await _change_status(order.id, "pending", "cancelled", session)
+        
+        if cancelled is None:
+            raise _status_conflict(order)
+        
+        await release_stock(lines, session)
+        return cancelled
     
-    db.commit()
-    db.refresh(order)
-    return order
+    cancelled = await in_transaction(write)
+    
+    return (await loader.load_orders([cancelled]))[0]
 
 @router.put("/{order_id}/status", response_model=OrderResponse)
 async def update_order_status(
-    order_id: int,
+    order_id: str,
     status: str,
-    db: Session = Depends(get_db),
+    loader: ResponseLoader = Depends(get_response_loader),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Update order status (admin only)"""
     valid_statuses = ["pending", "processing", "shipped", "delivered", "cancelled"]
     if status not in valid_statuses:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
+            status_code=400,
             detail=f"Invalid status. Must be one of: {', '.join(valid_statuses)}"
         )
     
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = await repo.orders.get(order_id)
     
     if order is None:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    # If changing to cancelled and not already cancelled, restore stock
-    if status == "cancelled" and order.status != "cancelled":
-        for item in order.items:
-            product = db.query(Product).filter(Product.id == item.product_id).first()
-            if product:
-                product.stock += item.quantity
-    
-    # If changing from cancelled to something else, decrease stock again
-    if order.status == "cancelled" and status != "cancelled":
-        for item in order.items:
-            product = db.query(Product).filter(Product.id == item.product_id).first()
-            if product:
-                if product.stock < item.quantity:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail=f"Not enough stock to restore order. Product '{product.name}' has {product.stock} items, but {item.quantity} needed."
-                    )
-                product.stock -= item.quantity
-    
-    order.status = status
-    db.commit()
-    db.refresh(order)
-    return order
+    # Changing from cancelled takes the stock again; changing to cancelled restores it
+    reserve = order.status == "cancelled" and status != "cancelled"
+    restore = status == "cancelled" and order.status != "cancelled"
+    lines = await _order_lines(order) if reserve or restore else {}
+    
+    # Flip the status only if no one else has changed it since it was read
+    async def write(session):
+        updated = await _change_status(order.id, order.status, status, session)
+        
+        if updated is None:
+            raise _status_conflict(order)
+        
+        if reserve:
+            try:
+                await _reserve_or_400(lines, session=session)
+            except HTTPException:
+                # Aborting the transaction undoes the flip; without one, undo it by hand
+                if session is None:
+                    await _change_status(order.id, status, order.status)
+                raise
+        
+        if restore:
+            await release_stock(lines, session)
+        return updated
+    
+    updated = await in_transaction(write)
+    
+    return (await loader.load_orders([updated]))[0]
 
 @router.get("/admin/all", response_model=List[OrderResponse])
 async def read_all_orders(
-    skip: int = 0,
-    limit: int = 10,
-    status: str = None,
-    db: Session = Depends(get_db),
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    loader: ResponseLoader = Depends(get_response_loader),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Get all orders (admin only)"""
-    query = db.query(Order)
+    query = cursor_filter(cursor, "created_at", -1)
     
     if status:
-        query = query.filter(Order.status == status)
+        query["status"] = status
+    
+    orders = await repo.orders.find_many(query, sort=ORDER_SORT, skip=0 if cursor else skip, limit=limit)
     
-    orders = query.order_by(Order.created_at.desc()).offset(skip).limit(limit).all()
-    return orders 
\ No newline at end of file
+    cursor_value = next_cursor(orders, "created_at", -1, limit)
+    if cursor_value:
+        response.headers[NEXT_CURSOR_HEADER] = cursor_value
+    return await loader.load_orders(orders)
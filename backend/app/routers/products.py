@@ -1,102 +1,303 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Optional
-from ..database import get_db
-from ..models import Product, Category, ProductImage, Review
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional, Tuple, Union
+from datetime import datetime
+import asyncio
+from pymongo.errors import DuplicateKeyError
+from .. import repositories as repo
+from ..database import in_transaction
+from ..models import Product, ProductImage, Review
 from ..schemas import (
-    ProductResponse, ProductCreate, ProductUpdate,
+    ProductResponse, ProductCardResponse, ProductCreate, ProductUpdate,
     ReviewCreate, ReviewResponse, ReviewUpdate,
-    CategoryResponse
+    CategoryResponse, CategorySummaryResponse, FacetedProductsResponse, ProductImportReport
 )
+from ..utils import catalog_io
 from ..utils.auth import get_current_active_user, get_current_admin_user
+from ..utils.catalog_io import CatalogFormat
+from ..utils.cache import product_cache, cache_product, invalidate_product
+from ..utils.category_index import CATEGORY_INDEX_CACHE_CONTROL, category_index
+from ..utils.conditional import (
+    collection_fingerprint, is_not_modified, make_etag, not_modified, validator_headers
+)
+from ..utils.pagination import NEXT_CURSOR_HEADER, cursor_filter, next_cursor
+from ..utils.pipelines import (
+    PRICE_BUCKET_BOUNDARIES, PRICE_BUCKET_OVERFLOW, RELEVANCE_FIELD,
+    product_facets_pipeline, product_listing_pipeline, product_lookup_stages, product_sort_key
+)
+from ..utils.ratings import record_rating
+from ..utils.responses import fast_json
+from ..utils.search import product_search_index
 from ..models import User
 
 router = APIRouter()
 
+async def _load_product(match: dict):
+    """Load a single product with its categories and images embedded"""
+    pipeline = [{"$match": match}, {"$limit": 1}] + product_lookup_stages()
+    products = await repo.products.aggregate(pipeline)
+    return products[0] if products else None
+
+def _product_validators(product: dict) -> Tuple[str, Optional[datetime]]:
+    """ETag and Last-Modified for an embedded product document"""
+    modified = [product.get("updated_at") or product.get("created_at")]
+    modified += [category.get("updated_at") for category in product["categories"]]
+    modified = [value for value in modified if value is not None]
+    etag = make_etag(product["_id"], modified, [image["_id"] for image in product["images"]])
+    return etag, max(modified, default=None)
+
+async def _catalog_validators(request: Request, *repositories) -> Tuple[str, Optional[datetime]]:
+    """ETag and Last-Modified for a listing, from the fingerprints of the collections it reads"""
+    fingerprints = await asyncio.gather(*[collection_fingerprint(repository) for repository in repositories])
+    last_modified = max((modified for _, modified in fingerprints if modified is not None), default=None)
+    return make_etag(request.url.path, request.url.query, fingerprints), last_modified
+
+async def _validate_category_ids(category_ids: List[str]):
+    """Ensure every referenced category exists"""
+    if not category_ids:
+        return
+    count = await repo.categories.count({"_id": {"$in": category_ids}})
+    if count != len(set(category_ids)):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="One or more category IDs are invalid"
+        )
+
+async def _category_id(slug: str) -> Optional[str]:
+    """Resolve a category slug to its id once, so listings can filter on the id"""
+    db_category = await repo.categories.find_one({"slug": slug})
+    return db_category.id if db_category is not None else None
+
+async def _resolve_listing(
+    search: Optional[str],
+    sort_by: Optional[str],
+    sort_order: Optional[str],
+    cursor: Optional[str]
+) -> Tuple[str, str, int, Optional[List[str]]]:
+    """Resolve the sort and search of a listing request
+
+    Returns the effective sort_by, the sort field and direction, and the
+    ranked search hits (None without a search term).
+    """
+    # Search results default to relevance order, everything else to newest first
+    if sort_by is None or (sort_by == "relevance" and not search):
+        sort_by = "relevance" if search else "created_at"
+    sort_field, direction = product_sort_key(sort_by, sort_order)
+    
+    if cursor and sort_field == RELEVANCE_FIELD:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor pagination is not available for relevance sorting"
+        )
+    
+    # Resolve the search term against the in-process index
+    ranked_ids = None
+    if search:
+        await product_search_index.sync()
+        ranked_ids = [product_id for product_id, _ in product_search_index.search(search)]
+    return sort_by, sort_field, direction, ranked_ids
+
+def _price_facets(buckets: List[dict]) -> List[dict]:
+    """Every price bucket in order, including empty ones"""
+    counts = {bucket["_id"]: bucket["count"] for bucket in buckets}
+    bounds = PRICE_BUCKET_BOUNDARIES
+    facets = [
+        {"min_price": low, "max_price": high, "count": counts.get(low, 0)}
+        for low, high in zip(bounds, bounds[1:])
+    ]
+    facets.append({"min_price": bounds[-1], "max_price": None, "count": counts.get(PRICE_BUCKET_OVERFLOW, 0)})
+    return facets
+
 # Products
-@router.get("/", response_model=List[ProductResponse])
+@router.get("/", response_model=Union[List[ProductResponse], List[ProductCardResponse]])
 async def read_products(
-    skip: int = 0,
-    limit: int = 10,
+    request: Request,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
     category: Optional[str] = None,
     search: Optional[str] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
-    sort_by: Optional[str] = "created_at",
+    sort_by: Optional[str] = None,
     sort_order: Optional[str] = "desc",
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    view: Literal["card", "detail"] = "detail"
 ):
     """Get all products with filtering and sorting options"""
-    query = db.query(Product).filter(Product.is_active == True)
+    sort_by, sort_field, direction, ranked_ids = await _resolve_listing(search, sort_by, sort_order, cursor)
     
-    # Apply category filter
-    if category:
-        query = query.join(Product.categories).filter(Category.slug == category)
+    # Answer revalidations before running the listing query
+    etag, last_modified = await _catalog_validators(
+        request, repo.products, repo.categories, repo.product_images
+    )
+    response.headers.update(validator_headers(etag, last_modified))
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(dict(response.headers))
+    
+    # Filter on the category id directly instead of joining per product
+    category_id = await _category_id(category) if category else None
+    
+    if ranked_ids == [] or (category and category_id is None):
+        return fast_json(List[ProductResponse], [], headers=dict(response.headers))
+    
+    # Filter, sort, paginate and embed categories/images in one round trip
+    pipeline = product_listing_pipeline(
+        skip=0 if cursor else skip,
+        limit=limit,
+        category_id=category_id,
+        ranked_ids=ranked_ids,
+        min_price=min_price,
+        max_price=max_price,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        keyset=cursor_filter(cursor, sort_field, direction),
+        view=view
+    )
+    products = await repo.products.aggregate(pipeline)
+    
+    # Hand out a cursor so the next page can be fetched without skipping
+    cursor_value = None
+    if sort_field != RELEVANCE_FIELD:
+        cursor_value = next_cursor(products, sort_field, direction, limit)
+    if cursor_value:
+        response.headers[NEXT_CURSOR_HEADER] = cursor_value
+    response_type = List[ProductCardResponse] if view == "card" else List[ProductResponse]
+    return fast_json(response_type, products, headers=dict(response.headers))
+
+@router.get("/facets", response_model=FacetedProductsResponse)
+async def read_product_facets(
+    request: Request,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    category: Optional[str] = None,
+    search: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    sort_by: Optional[str] = None,
+    sort_order: Optional[str] = "desc",
+    cursor: Optional[str] = None,
+    view: Literal["card", "detail"] = "detail"
+):
+    """Get a page of products with its total and per-category/price facet counts"""
+    sort_by, sort_field, direction, ranked_ids = await _resolve_listing(search, sort_by, sort_order, cursor)
     
-    # Apply search filter
-    if search:
-        search_term = f"%{search}%"
-        query = query.filter(Product.name.ilike(search_term) | Product.description.ilike(search_term))
-    
-    # Apply price filters
-    if min_price is not None:
-        query = query.filter(Product.price >= min_price)
-    if max_price is not None:
-        query = query.filter(Product.price <= max_price)
-    
-    # Apply sorting
-    if sort_by == "price":
-        if sort_order == "asc":
-            query = query.order_by(Product.price.asc())
-        else:
-            query = query.order_by(Product.price.desc())
-    elif sort_by == "name":
-        if sort_order == "asc":
-            query = query.order_by(Product.name.asc())
-        else:
-            query = query.order_by(Product.name.desc())
-    else:  # default sort by created_at
-        if sort_order == "asc":
-            query = query.order_by(Product.created_at.asc())
-        else:
-            query = query.order_by(Product.created_at.desc())
-    
-    # Apply pagination
-    products = query.offset(skip).limit(limit).all()
-    return products
+    etag, last_modified = await _catalog_validators(
+        request, repo.products, repo.categories, repo.product_images
+    )
+    response.headers.update(validator_headers(etag, last_modified))
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(dict(response.headers))
+    
+    # Filter on the category id directly instead of joining per product
+    category_id = await _category_id(category) if category else None
+    if category and category_id is None:
+        raise HTTPException(status_code=404, detail="Category not found")
+    
+    # Page, total and every facet come back from a single $facet aggregation
+    pipeline = product_facets_pipeline(
+        skip=0 if cursor else skip,
+        limit=limit,
+        category_id=category_id,
+        ranked_ids=ranked_ids,
+        min_price=min_price,
+        max_price=max_price,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        keyset=cursor_filter(cursor, sort_field, direction),
+        view=view
+    )
+    result = (await repo.products.aggregate(pipeline))[0]
+    
+    # Label category counts with their slug and name
+    category_counts = {row["_id"]: row["count"] for row in result["categories"]}
+    categories = await repo.categories.find_by_ids(category_counts)
+    category_facets = [
+        {"id": facet_category.id, "slug": facet_category.slug, "name": facet_category.name,
+         "count": category_counts[facet_category.id]}
+        for facet_category in sorted(categories.values(), key=lambda c: c.name)
+    ]
+    facets = {"categories": category_facets, "price": _price_facets(result["price"])}
+    
+    cursor_value = None
+    if sort_field != RELEVANCE_FIELD:
+        cursor_value = next_cursor(result["items"], sort_field, direction, limit)
+    if cursor_value:
+        response.headers[NEXT_CURSOR_HEADER] = cursor_value
+    
+    total = result["total"][0]["count"] if result["total"] else 0
+    return fast_json(
+        FacetedProductsResponse,
+        {"items": result["items"], "total": total, "facets": facets},
+        headers=dict(response.headers)
+    )
+
+@router.get("/export")
+async def export_products(
+    format: CatalogFormat = Query("ndjson"),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Stream every product in the bulk import format (admin only)"""
+    return StreamingResponse(
+        catalog_io.export_products(format),
+        media_type=catalog_io.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="products.{format}"'}
+    )
 
 @router.get("/{product_id}", response_model=ProductResponse)
-async def read_product(product_id: int, db: Session = Depends(get_db)):
+async def read_product(product_id: str, request: Request, response: Response):
     """Get a specific product by ID"""
-    product = db.query(Product).filter(Product.id == product_id, Product.is_active == True).first()
+    product = product_cache.get(("id", product_id))
     if product is None:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return product
+        product = await _load_product({"_id": product_id, "is_active": True})
+        if product is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        cache_product(product)
+    
+    etag, last_modified = _product_validators(product)
+    response.headers.update(validator_headers(etag, last_modified))
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(dict(response.headers))
+    return fast_json(ProductResponse, product, headers=dict(response.headers))
 
 @router.get("/slug/{slug}", response_model=ProductResponse)
-async def read_product_by_slug(slug: str, db: Session = Depends(get_db)):
+async def read_product_by_slug(slug: str, request: Request, response: Response):
     """Get a specific product by slug"""
-    product = db.query(Product).filter(Product.slug == slug, Product.is_active == True).first()
+    product = product_cache.get(("slug", slug))
     if product is None:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return product
+        product = await _load_product({"slug": slug, "is_active": True})
+        if product is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        cache_product(product)
+    
+    etag, last_modified = _product_validators(product)
+    response.headers.update(validator_headers(etag, last_modified))
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(dict(response.headers))
+    return fast_json(ProductResponse, product, headers=dict(response.headers))
+
+@router.get("/cache/stats")
+async def read_product_cache_stats(current_user: User = Depends(get_current_admin_user)):
+    """Get product cache hit/miss counters (admin only)"""
+    return product_cache.stats()
 
 @router.post("/", response_model=ProductResponse, status_code=status.HTTP_201_CREATED)
 async def create_product(
     product: ProductCreate,
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Create a new product (admin only)"""
     # Check if slug already exists
-    db_product = db.query(Product).filter(Product.slug == product.slug).first()
-    if db_product:
+    if await repo.products.exists({"slug": product.slug}):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Slug already in use"
         )
     
+    # Validate categories
+    await _validate_category_ids(product.category_ids)
+    
     # Create product
     db_product = Product(
         name=product.name,
@@ -105,53 +306,51 @@ async def create_product(
         price=product.price,
         sale_price=product.sale_price,
         stock=product.stock,
-        is_active=product.is_active
+        is_active=product.is_active,
+        category_ids=product.category_ids
     )
-    
-    # Add categories
-    if product.category_ids:
-        categories = db.query(Category).filter(Category.id.in_(product.category_ids)).all()
-        if len(categories) != len(product.category_ids):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="One or more category IDs are invalid"
-            )
-        db_product.categories = categories
-    
-    db.add(db_product)
-    db.commit()
-    db.refresh(db_product)
+    await repo.products.insert(db_product)
     
     # Add images
-    for image_data in product.images:
-        db_image = ProductImage(
+    await repo.product_images.insert_many([
+        ProductImage(
             product_id=db_product.id,
             image_url=image_data.image_url,
             alt_text=image_data.alt_text,
             is_primary=image_data.is_primary
         )
-        db.add(db_image)
+        for image_data in product.images
+    ])
     
-    db.commit()
-    db.refresh(db_product)
-    return db_product
+    product_search_index.index_product(db_product)
+    category_index.mark_dirty(db_product.category_ids)
+    return await _load_product({"_id": db_product.id})
+
+@router.post("/import", response_model=ProductImportReport)
+async def import_products(
+    request: Request,
+    format: CatalogFormat = Query("ndjson"),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Create or update products in bulk from an NDJSON or CSV request body (admin only)"""
+    return await catalog_io.import_products(request.stream(), format)
 
 @router.put("/{product_id}", response_model=ProductResponse)
 async def update_product(
-    product_id: int,
+    product_id: str,
     product_update: ProductUpdate,
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Update a product (admin only)"""
-    db_product = db.query(Product).filter(Product.id == product_id).first()
+    db_product = await repo.products.get(product_id)
     if db_product is None:
         raise HTTPException(status_code=404, detail="Product not found")
+    old_slug = db_product.slug
+    old_category_ids = db_product.category_ids
     
     # Check if slug is being changed and if it's already in use
     if product_update.slug is not None and product_update.slug != db_product.slug:
-        existing_product = db.query(Product).filter(Product.slug == product_update.slug).first()
-        if existing_product:
+        if await repo.products.exists({"slug": product_update.slug}):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Slug already in use"
@@ -160,68 +359,49 @@ async def update_product(
     # Update product fields
     update_data = product_update.model_dump(exclude_unset=True)
     
-    # Handle category IDs separately
-    category_ids = update_data.pop("category_ids", None)
+    # Validate category IDs if provided
+    if update_data.get("category_ids") is not None:
+        await _validate_category_ids(update_data["category_ids"])
     
     for field, value in update_data.items():
         setattr(db_product, field, value)
     
-    # Update categories if provided
-    if category_ids is not None:
-        categories = db.query(Category).filter(Category.id.in_(category_ids)).all()
-        if len(categories) != len(category_ids):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="One or more category IDs are invalid"
-            )
-        db_product.categories = categories
-    
-    db.commit()
-    db.refresh(db_product)
-    return db_product
+    await repo.products.replace(db_product)
+    invalidate_product(db_product.id, old_slug)
+    product_search_index.index_product(db_product)
+    category_index.mark_dirty([*old_category_ids, *db_product.category_ids])
+    return await _load_product({"_id": db_product.id})
 
 @router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_product(
-    product_id: int,
-    db: Session = Depends(get_db),
+    product_id: str,
     current_user: User = Depends(get_current_admin_user)
 ):
     """Delete or deactivate a product (admin only)"""
-    db_product = db.query(Product).filter(Product.id == product_id).first()
+    db_product = await repo.products.get(product_id)
     if db_product is None:
         raise HTTPException(status_code=404, detail="Product not found")
     
     # Instead of deleting, just mark as inactive
     db_product.is_active = False
-    db.commit()
+    await repo.products.replace(db_product)
+    invalidate_product(db_product.id, db_product.slug)
+    product_search_index.index_product(db_product)
+    category_index.mark_dirty(db_product.category_ids)
     return None
 
 # Product reviews
 @router.post("/{product_id}/reviews", response_model=ReviewResponse, status_code=status.HTTP_201_CREATED)
 async def create_product_review(
-    product_id: int,
+    product_id: str,
     review: ReviewCreate,
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Create a review for a product"""
     # Check if product exists
-    product = db.query(Product).filter(Product.id == product_id, Product.is_active == True).first()
-    if product is None:
+    if not await repo.products.exists({"_id": product_id, "is_active": True}):
         raise HTTPException(status_code=404, detail="Product not found")
     
-    # Check if user already reviewed this product
-    existing_review = db.query(Review).filter(
-        Review.product_id == product_id,
-        Review.user_id == current_user.id
-    ).first()
-    
-    if existing_review:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="You have already reviewed this product"
-        )
-    
     # Create review
     db_review = Review(
         product_id=product_id,
@@ -230,92 +410,152 @@ async def create_product_review(
         comment=review.comment
     )
     
-    db.add(db_review)
-    db.commit()
-    db.refresh(db_review)
+    # Store the review and fold it into the product's rating summary together;
+    # the unique (product_id, user_id) index rejects a second review
+    async def write(session):
+        await repo.reviews.insert(db_review, session=session)
+        await record_rating(product_id, added=db_review.rating, session=session)
+    
+    try:
+        await in_transaction(write)
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="You have already reviewed this product"
+        )
     
     # Include user data in response
-    setattr(db_review, "user", current_user)
-    return db_review
+    return {**db_review.model_dump(), "user": current_user}
 
 @router.get("/{product_id}/reviews", response_model=List[ReviewResponse])
 async def read_product_reviews(
-    product_id: int,
-    skip: int = 0,
-    limit: int = 10,
-    db: Session = Depends(get_db)
+    product_id: str,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None
 ):
     """Get all reviews for a product"""
     # Check if product exists
-    product = db.query(Product).filter(Product.id == product_id, Product.is_active == True).first()
-    if product is None:
+    if not await repo.products.exists({"_id": product_id, "is_active": True}):
         raise HTTPException(status_code=404, detail="Product not found")
     
-    # Get reviews with user data
-    reviews = db.query(Review).filter(Review.product_id == product_id).order_by(
-        Review.created_at.desc()
-    ).offset(skip).limit(limit).all()
+    # Get reviews newest first, resuming after the cursor if one was given
+    query = {"product_id": product_id, **cursor_filter(cursor, "created_at", -1)}
+    reviews = await repo.reviews.find_many(
+        query,
+        sort=[("created_at", -1), ("_id", -1)],
+        skip=0 if cursor else skip,
+        limit=limit
+    )
     
-    return reviews
+    cursor_value = next_cursor(reviews, "created_at", -1, limit)
+    if cursor_value:
+        response.headers[NEXT_CURSOR_HEADER] = cursor_value
+    
+    # Attach user data with a single lookup for the page
+    users = await repo.users.find_by_ids(review.user_id for review in reviews)
+    return [
+        {**review.model_dump(), "user": users[review.user_id]}
+        for review in reviews
+        if review.user_id in users
+    ]
 
 @router.put("/{product_id}/reviews/{review_id}", response_model=ReviewResponse)
 async def update_product_review(
-    product_id: int,
-    review_id: int,
+    product_id: str,
+    review_id: str,
     review_update: ReviewUpdate,
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Update a review for a product"""
     # Check if review exists and belongs to current user
-    db_review = db.query(Review).filter(
-        Review.id == review_id,
-        Review.product_id == product_id,
-        Review.user_id == current_user.id
-    ).first()
+    db_review = await repo.reviews.find_one({
+        "_id": review_id,
+        "product_id": product_id,
+        "user_id": current_user.id
+    })
     
     if db_review is None:
         raise HTTPException(status_code=404, detail="Review not found or you don't have permission to edit it")
     
-    # Update review fields
-    for field, value in review_update.model_dump(exclude_unset=True).items():
-        setattr(db_review, field, value)
+    # A review always keeps a rating; only the comment can be cleared
+    updates = review_update.model_dump(exclude_unset=True)
+    if "rating" in updates and updates["rating"] is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Rating cannot be removed from a review"
+        )
     
-    db.commit()
-    db.refresh(db_review)
+    # Write the edit only if the rating is still the one read, so the
+    # summary moves by exactly this request's change
+    old_rating = db_review.rating
+    
+    async def write(session):
+        doc = await repo.reviews.find_one_and_update(
+            {"_id": review_id, "product_id": product_id, "user_id": current_user.id, "rating": old_rating},
+            {"$set": {**updates, "updated_at": datetime.utcnow()}},
+            session=session
+        )
+        
+        if doc is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Review changed while updating; reload and try again"
+            )
+        
+        updated = Review.model_validate(doc)
+        # Only a changed rating moves the product's summary
+        if updated.rating != old_rating:
+            await record_rating(product_id, added=updated.rating, removed=old_rating, session=session)
+        return updated
+    
+    db_review = await in_transaction(write)
     
     # Include user data in response
-    setattr(db_review, "user", current_user)
-    return db_review
+    return {**db_review.model_dump(), "user": current_user}
 
 @router.delete("/{product_id}/reviews/{review_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_product_review(
-    product_id: int,
-    review_id: int,
-    db: Session = Depends(get_db),
+    product_id: str,
+    review_id: str,
     current_user: User = Depends(get_current_active_user)
 ):
     """Delete a review for a product"""
     # Check if review exists and belongs to current user, or user is admin
-    query = db.query(Review).filter(
-        Review.id == review_id,
-        Review.product_id == product_id
-    )
+    query = {"_id": review_id, "product_id": product_id}
     
     if not current_user.is_admin:
-        query = query.filter(Review.user_id == current_user.id)
-    
-    db_review = query.first()
-    
-    if db_review is None:
-        raise HTTPException(status_code=404, detail="Review not found or you don't have permission to delete it")
-    
-    db.delete(db_review)
-    db.commit()
+        query["user_id"] = current_user.id
+    
+    # Delete and read back in one step, so only the request that removed
+    # the review takes its rating out of the summary
+    async def write(session):
+        deleted = await repo.reviews.find_one_and_delete(query, session=session)
+        
+        if deleted is None:
+            raise HTTPException(status_code=404, detail="Review not found or you don't have permission to delete it")
+        
+        await record_rating(product_id, removed=deleted["rating"], session=session)
+    
+    await in_transaction(write)
     return None
 
 # Categories
 @router.get("/categories/all", response_model=List[CategoryResponse])
-async def read_categories(db: Session = Depends(get_db)):
+async def read_categories(request: Request, response: Response):
     """Get all categories"""
-    return db.query(Category).all() 
\ No newline at end of file
+    etag, last_modified = await _catalog_validators(request, repo.categories)
+    response.headers.update(validator_headers(etag, last_modified))
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(dict(response.headers))
+    return fast_json(List[CategoryResponse], await repo.categories.find_many({}), headers=dict(response.headers))
+
+@router.get("/categories/index", response_model=List[CategorySummaryResponse])
+async def read_category_index(request: Request):
+    """Get categories with product counts, price ranges and a primary image"""
+    snapshot = await category_index.snapshot()
+    headers = validator_headers(snapshot.etag, snapshot.last_modified, CATEGORY_INDEX_CACHE_CONTROL)
+    if is_not_modified(request, snapshot.etag, snapshot.last_modified):
+        return not_modified(headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr, Field, ConfigDict
-from typing import List, Optional, Union
+from pydantic import BaseModel, EmailStr, Field, ConfigDict, AliasChoices
+from typing import Dict, List, Optional, Union
 from datetime import datetime
 
 # User schemas
@@ -20,7 +20,7 @@ class UserUpdate(BaseModel):
     password: Optional[str] = None
 
 class UserResponse(UserBase):
-    id: int
+    id: str = Field(validation_alias=AliasChoices("id", "_id"))
     is_active: bool
     is_admin: bool
     created_at: datetime
@@ -59,8 +59,8 @@ class AddressUpdate(BaseModel):
     is_default: Optional[bool] = None
 
 class AddressResponse(AddressBase):
-    id: int
-    user_id: int
+    id: str = Field(validation_alias=AliasChoices("id", "_id"))
+    user_id: str
     
     model_config = ConfigDict(from_attributes=True)
 
@@ -80,11 +80,17 @@ class CategoryUpdate(BaseModel):
     image_url: Optional[str] = None
 
 class CategoryResponse(CategoryBase):
-    id: int
+    id: str = Field(validation_alias=AliasChoices("id", "_id"))
     slug: str
     
     model_config = ConfigDict(from_attributes=True)
 
+class CategorySummaryResponse(CategoryResponse):
+    product_count: int = 0
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    primary_image: Optional[str] = None
+
 # Product image schemas
 class ProductImageBase(BaseModel):
     image_url: str
@@ -100,12 +106,17 @@ class ProductImageUpdate(BaseModel):
     is_primary: Optional[bool] = None
 
 class ProductImageResponse(ProductImageBase):
-    id: int
-    product_id: int
+    id: str = Field(validation_alias=AliasChoices("id", "_id"))
+    product_id: str
     
     model_config = ConfigDict(from_attributes=True)
 
 # Product schemas
+class RatingSummaryResponse(BaseModel):
+    count: int = 0
+    average: float = 0.0
+    histogram: Dict[str, int] = {}
+
 class ProductBase(BaseModel):
     name: str
     description: str
@@ -116,7 +127,7 @@ class ProductBase(BaseModel):
 
 class ProductCreate(ProductBase):
     slug: str
-    category_ids: List[int]
+    category_ids: List[str]
     images: List[ProductImageCreate] = []
 
 class ProductUpdate(BaseModel):
@@ -127,21 +138,71 @@ class ProductUpdate(BaseModel):
     sale_price: Optional[float] = None
     stock: Optional[int] = None
     is_active: Optional[bool] = None
-    category_ids: Optional[List[int]] = None
+    category_ids: Optional[List[str]] = None
 
 class ProductResponse(ProductBase):
-    id: int
+    id: str = Field(validation_alias=AliasChoices("id", "_id"))
     slug: str
     created_at: datetime
     updated_at: Optional[datetime] = None
     categories: List[CategoryResponse] = []
     images: List[ProductImageResponse] = []
+    rating: RatingSummaryResponse = RatingSummaryResponse()
+    
+    model_config = ConfigDict(from_attributes=True)
+
+class ProductCardResponse(BaseModel):
+    id: str = Field(validation_alias=AliasChoices("id", "_id"))
+    name: str
+    slug: str
+    price: float
+    sale_price: Optional[float] = None
+    images: List[ProductImageResponse] = []
+    rating: RatingSummaryResponse = RatingSummaryResponse()
     
     model_config = ConfigDict(from_attributes=True)
 
+# Faceted listing schemas
+class CategoryFacet(BaseModel):
+    id: str
+    slug: str
+    name: str
+    count: int
+
+class PriceFacet(BaseModel):
+    min_price: float
+    max_price: Optional[float] = None
+    count: int
+
+class ProductFacets(BaseModel):
+    categories: List[CategoryFacet] = []
+    price: List[PriceFacet] = []
+
+class FacetedProductsResponse(BaseModel):
+    items: List[Union[ProductResponse, ProductCardResponse]]
+    total: int
+    facets: ProductFacets
+
+# Bulk import/export schemas
+class ProductImportRow(ProductBase):
+    slug: str
+    categories: List[str] = []
+    images: List[ProductImageCreate] = []
+
+class ProductImportError(BaseModel):
+    row: int
+    slug: Optional[str] = None
+    error: str
+
+class ProductImportReport(BaseModel):
+    created: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: List[ProductImportError] = []
+
 # Cart item schemas
 class CartItemBase(BaseModel):
-    product_id: int
+    product_id: str
     quantity: int = 1
 
 class CartItemCreate(CartItemBase):
@@ -151,24 +212,28 @@ class CartItemUpdate(BaseModel):
     quantity: int
 
 class CartItemResponse(BaseModel):
-    id: int
+    id: str = Field(validation_alias=AliasChoices("id", "_id"))
     product: ProductResponse
     quantity: int
     added_at: datetime
     
     model_config = ConfigDict(from_attributes=True)
 
+class GuestCartSession(BaseModel):
+    token: str
+    expires_at: datetime
+
 # Order schemas
 class OrderItemCreate(BaseModel):
-    product_id: int
-    quantity: int
+    product_id: str
+    quantity: int = Field(..., gt=0)
 
 class OrderCreate(BaseModel):
-    address_id: int
+    address_id: str
     items: List[OrderItemCreate]
 
 class OrderItemResponse(BaseModel):
-    id: int
+    id: str = Field(validation_alias=AliasChoices("id", "_id"))
     product: ProductResponse
     quantity: int
     price: float
@@ -176,8 +241,8 @@ class OrderItemResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 class OrderResponse(BaseModel):
-    id: int
-    user_id: int
+    id: str = Field(validation_alias=AliasChoices("id", "_id"))
+    user_id: str
     address: AddressResponse
     total_amount: float
     status: str
@@ -189,7 +254,7 @@ class OrderResponse(BaseModel):
 
 # Review schemas
 class ReviewBase(BaseModel):
-    product_id: int
+    product_id: str
     rating: int = Field(..., ge=1, le=5)
     comment: Optional[str] = None
 
@@ -201,9 +266,9 @@ class ReviewUpdate(BaseModel):
     comment: Optional[str] = None
 
 class ReviewResponse(BaseModel):
-    id: int
-    user_id: int
-    product_id: int
+    id: str = Field(validation_alias=AliasChoices("id", "_id"))
+    user_id: str
+    product_id: str
     rating: int
     comment: Optional[str] = None
     created_at: datetime
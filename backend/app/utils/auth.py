@@ -1,36 +1,79 @@
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import os
-from typing import Optional
+import time
+from typing import Any, Callable, Optional
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from ..database import get_db
+from .. import repositories as repo
 from ..models import User
 from ..schemas import TokenData
+from .cache import token_cache, principal_cache
 
 # Configuration from environment variables with defaults
 SECRET_KEY = os.environ.get("SECRET_KEY", "your_secret_key_here")
 ALGORITHM = os.environ.get("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.environ.get("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing; changing BCRYPT_ROUNDS rehashes passwords on next login
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# Password work runs on a dedicated pool so it never blocks the event loop
+PASSWORD_WORKERS = int(os.environ.get("PASSWORD_WORKERS", 4))
+PASSWORD_QUEUE_LIMIT = int(os.environ.get("PASSWORD_QUEUE_LIMIT", 32))
+
+class PasswordPool:
+    """Bounded thread pool for bcrypt work that sheds load when its queue is full"""
+
+    def __init__(self, workers: int, queue_limit: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password")
+        self._capacity = workers + queue_limit
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        # Reject straight away rather than queueing behind a login storm
+        if self._pending >= self._capacity:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please try again shortly",
+                headers={"Retry-After": "1"},
+            )
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._pending -= 1
+
+password_pool = PasswordPool(PASSWORD_WORKERS, PASSWORD_QUEUE_LIMIT)
 
 # OAuth2 setup
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/login")
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def hash_password(password: str) -> str:
+    """Hash a password on the password pool"""
+    return await password_pool.run(pwd_context.hash, password)
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
-def authenticate_user(db: Session, email: str, password: str):
-    user = db.query(User).filter(User.email == email).first()
-    if not user or not verify_password(password, user.hashed_password):
+async def authenticate_user(email: str, password: str):
+    user = await repo.users.find_one({"email": email})
+    if not user:
+        return False
+    valid, new_hash = await password_pool.run(
+        pwd_context.verify_and_update, password, user.hashed_password
+    )
+    if not valid:
         return False
+    # Upgrade hashes made with an outdated cost factor while we know the password
+    if new_hash:
+        user.hashed_password = new_hash
+        await repo.users.replace(user)
     return user
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -43,25 +86,46 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
+def _seconds_until(exp: Optional[int]) -> float:
+    """Seconds left before a token's exp claim"""
+    if exp is None:
+        return float("inf")
+    return exp - time.time()
+
+def decode_access_token(token: str) -> TokenData:
+    """Decode and verify a bearer token, memoizing the result until it expires"""
+    token_data = token_cache.get(token)
+    if token_data is None:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        user_id: str = payload.get("sub")
+        if user_id is None:
+            raise JWTError("Token has no subject")
+        token_data = TokenData(sub=user_id, exp=payload.get("exp"))
+        token_cache.set(token, token_data, ttl=_seconds_until(token_data.exp))
+    elif _seconds_until(token_data.exp) <= 0:
+        raise JWTError("Signature has expired")
+    return token_data
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-        token_data = TokenData(sub=user_id, exp=payload.get("exp"))
+        token_data = decode_access_token(token)
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == token_data.sub).first()
+    # Serve the principal from memory for a short while after loading it
+    user = principal_cache.get(token_data.sub)
     if user is None:
-        raise credentials_exception
-    return user
+        user = await repo.users.get(token_data.sub)
+        if user is None:
+            raise credentials_exception
+        principal_cache.set(token_data.sub, user, ttl=_seconds_until(token_data.exp))
+    # Hand each request its own copy so route changes don't leak into the cache
+    return user.model_copy()
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)):
     if not current_user.is_active:
@@ -0,0 +1,93 @@
+from typing import Any, Callable, Dict, Hashable, Optional
+from collections import OrderedDict
+import os
+import time
+
+# Product detail cache settings
+PRODUCT_CACHE_SIZE = int(os.environ.get("PRODUCT_CACHE_SIZE", 2048))
+PRODUCT_CACHE_TTL = float(os.environ.get("PRODUCT_CACHE_TTL", 60))
+
+# Authenticated principal cache settings
+PRINCIPAL_CACHE_SIZE = int(os.environ.get("PRINCIPAL_CACHE_SIZE", 10000))
+PRINCIPAL_CACHE_TTL = float(os.environ.get("PRINCIPAL_CACHE_TTL", 30))
+
+class TTLCache:
+    """Bounded LRU cache whose entries also expire after a fixed time-to-live"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0, timer: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > self._timer():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._data[key]
+        self.misses += 1
+        return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store a value; ttl can only shorten the cache-wide time-to-live"""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        self._data[key] = (self._timer() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+# Product detail responses, keyed by ("id", id) and ("slug", slug)
+product_cache = TTLCache(maxsize=PRODUCT_CACHE_SIZE, ttl=PRODUCT_CACHE_TTL)
+
+def cache_product(product: Dict[str, Any]):
+    """Store an embedded product document under both its id and slug"""
+    product_cache.set(("id", product["_id"]), product)
+    product_cache.set(("slug", product["slug"]), product)
+
+def invalidate_product(product_id: str, slug: Optional[str] = None):
+    """Drop a product's cached entries, including the slug it was cached under"""
+    cached = product_cache.pop(("id", product_id))
+    if cached is not None:
+        product_cache.pop(("slug", cached["slug"]))
+    if slug is not None:
+        product_cache.pop(("slug", slug))
+
+# Decoded access tokens keyed by the raw token, and users keyed by token sub
+token_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+def invalidate_user(user_id: str):
+    """Force the next request authenticated as this user to reload it"""
+    principal_cache.pop(user_id)
@@ -0,0 +1,272 @@
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+import asyncio
+import hashlib
+import logging
+import os
+import secrets
+from fastapi import Header, HTTPException, status
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from .. import repositories as repo
+from ..models import Cart, CartLine, GuestCart
+from ..schemas import GuestCartSession
+
+logger = logging.getLogger(__name__)
+
+# Guest carts expire this many seconds after their last change
+GUEST_CART_TTL = int(os.environ.get("GUEST_CART_TTL", 7 * 24 * 60 * 60))
+
+# Rounds of writes a guest cart merge makes before leaving lines behind
+GUEST_CART_MERGE_ATTEMPTS = 3
+
+def _find_line(cart: Optional[Cart], **match) -> Optional[CartLine]:
+    """First line of a cart whose fields equal the given values"""
+    lines = cart.lines if cart is not None else []
+    return next((line for line in lines if all(getattr(line, field) == value for field, value in match.items())), None)
+
+class CartStore:
+    """Line operations on one cart document, a user's or a guest's
+
+    Guest carts pass a ttl, and every write pushes their expiry back.
+    """
+
+    def __init__(self, carts: repo.Repository, cart_id: str, ttl: Optional[int] = None):
+        self.carts = carts
+        self.cart_id = cart_id
+        self.ttl = ttl
+
+    def _touch(self) -> Dict[str, Any]:
+        now = datetime.utcnow()
+        fields: Dict[str, Any] = {"updated_at": now}
+        if self.ttl is not None:
+            fields["expires_at"] = now + timedelta(seconds=self.ttl)
+        return fields
+
+    async def get(self) -> Optional[Cart]:
+        return await self.carts.get(self.cart_id)
+
+    async def lines(self) -> List[CartLine]:
+        cart = await self.get()
+        return cart.lines if cart is not None else []
+
+    async def _top_up(self, product_id: str, quantity: int, stock: int) -> Optional[dict]:
+        # Add to the product's existing line if the result stays within stock
+        return await self.carts.find_one_and_update(
+            {
+                "_id": self.cart_id,
+                "lines": {"$elemMatch": {"product_id": product_id, "quantity": {"$lte": stock - quantity}}}
+            },
+            {"$inc": {"lines.$.quantity": quantity}, "$set": self._touch()}
+        )
+
+    async def add(self, product_id: str, quantity: int) -> CartLine:
+        """Add a product, topping up its line if the cart already has one"""
+        # Check if product exists and is active
+        product = await repo.products.get(product_id, is_active=True)
+
+        if product is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+
+        # Check if product is in stock
+        if product.stock < quantity:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Not enough stock available. Only {product.stock} items left."
+            )
+
+        # Top up the product's line while it stays within stock
+        doc = await self._top_up(product_id, quantity, product.stock)
+
+        if doc is None:
+            # Otherwise append a new line, creating the cart on first use. A
+            # cart that already has the product fails the filter and the
+            # upsert then collides with it on _id.
+            try:
+                doc = await self.carts.find_one_and_update(
+                    {"_id": self.cart_id, "lines.product_id": {"$ne": product_id}},
+                    {
+                        "$push": {"lines": CartLine(product_id=product_id, quantity=quantity).model_dump()},
+                        "$set": self._touch()
+                    },
+                    upsert=True
+                )
+            except DuplicateKeyError:
+                # The line may have been added concurrently, so try topping it up once more
+                doc = await self._top_up(product_id, quantity, product.stock)
+
+        if doc is None:
+            existing_line = _find_line(await self.get(), product_id=product_id)
+            in_cart = existing_line.quantity if existing_line else 0
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Cannot add more items. Only {product.stock} items in stock and you already have {in_cart} in your cart."
+            )
+
+        return _find_line(self.carts.model.model_validate(doc), product_id=product_id)
+
+    async def update(self, item_id: str, quantity: int) -> CartLine:
+        """Set the quantity of a line"""
+        line = _find_line(await self.get(), id=item_id)
+
+        if line is None:
+            raise HTTPException(status_code=404, detail="Cart item not found")
+
+        # Check if product is active and has enough stock
+        product = await repo.products.get(line.product_id, is_active=True)
+
+        if product is None:
+            raise HTTPException(status_code=404, detail="Product no longer available")
+
+        if product.stock < quantity:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Not enough stock available. Only {product.stock} items left."
+            )
+
+        # Update quantity in place; the line may have been removed since it was read
+        updated = await self.carts.update_one(
+            {"_id": self.cart_id, "lines.id": item_id},
+            {"$set": {"lines.$.quantity": quantity, **self._touch()}}
+        )
+
+        if not updated:
+            raise HTTPException(status_code=404, detail="Cart item not found")
+
+        line.quantity = quantity
+        return line
+
+    async def remove(self, item_id: str):
+        removed = await self.carts.update_one(
+            {"_id": self.cart_id, "lines.id": item_id},
+            {"$pull": {"lines": {"id": item_id}}, "$set": self._touch()}
+        )
+
+        if not removed:
+            raise HTTPException(status_code=404, detail="Cart item not found")
+
+    async def clear(self):
+        await self.carts.update_one({"_id": self.cart_id}, {"$set": {"lines": [], **self._touch()}})
+
+def user_cart(user_id: str) -> CartStore:
+    return CartStore(repo.carts, user_id)
+
+# Guest carts
+def new_guest_token() -> str:
+    """Opaque token a guest presents in the X-Guest-Cart header"""
+    return secrets.token_urlsafe(32)
+
+def guest_cart_id(token: str) -> str:
+    # Only a digest of the token is stored, so the collection cannot be used to hijack carts
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def guest_cart(token: str) -> CartStore:
+    return CartStore(repo.guest_carts, guest_cart_id(token), ttl=GUEST_CART_TTL)
+
+async def create_guest_cart() -> GuestCartSession:
+    """Start an empty guest cart and return its token"""
+    token = new_guest_token()
+    now = datetime.utcnow()
+    cart = GuestCart(id=guest_cart_id(token), updated_at=now, expires_at=now + timedelta(seconds=GUEST_CART_TTL))
+    await repo.guest_carts.insert(cart)
+    return GuestCartSession(token=token, expires_at=cart.expires_at)
+
+def get_guest_cart(x_guest_cart: str = Header(..., min_length=32, max_length=128)) -> CartStore:
+    """The cart for the guest token in the X-Guest-Cart header"""
+    return guest_cart(x_guest_cart)
+
+# Cart line id and quantity a guest line should leave in the user's cart
+MergeTarget = Tuple[str, int]
+
+def _merge_operations(
+    user_id: str,
+    cart: Optional[Cart],
+    lines: List[CartLine],
+    stock: Dict[str, int]
+) -> Tuple[List[UpdateOne], Dict[str, MergeTarget]]:
+    """Writes that fold guest lines into a user's cart as it was last read
+
+    Top-ups only match while the line still holds the quantity that was
+    read, so a line changed concurrently is retried rather than clobbered.
+    """
+    now = datetime.utcnow()
+    operations = []
+    targets: Dict[str, MergeTarget] = {}
+    new_lines = []
+    for line in lines:
+        existing_line = _find_line(cart, product_id=line.product_id)
+        if existing_line is None:
+            quantity = min(line.quantity, stock[line.product_id])
+            new_lines.append(line.model_copy(update={"quantity": quantity}).model_dump())
+            targets[line.id] = (line.id, quantity)
+            continue
+        quantity = min(existing_line.quantity + line.quantity, stock[line.product_id])
+        targets[line.id] = (existing_line.id, quantity)
+        if quantity != existing_line.quantity:
+            operations.append(UpdateOne(
+                {"_id": user_id, "lines": {"$elemMatch": {"id": existing_line.id, "quantity": existing_line.quantity}}},
+                {"$set": {"lines.$.quantity": quantity, "updated_at": now}}
+            ))
+    if new_lines:
+        operations.append(UpdateOne(
+            {"_id": user_id, "lines.product_id": {"$nin": [line["product_id"] for line in new_lines]}},
+            {"$push": {"lines": {"$each": new_lines}}, "$set": {"updated_at": now}},
+            upsert=True
+        ))
+    return operations, targets
+
+def _merged(cart: Optional[Cart], target: MergeTarget) -> bool:
+    line_id, quantity = target
+    line = _find_line(cart, id=line_id)
+    return line is not None and line.quantity == quantity
+
+async def merge_guest_cart(token: str, user_id: str):
+    """Fold a guest cart into a user's cart in one bulk write and drop it
+
+    Quantities for products in both carts are added together and every
+    line is capped at the product's current stock; lines for products
+    that are gone or sold out are dropped. Moved lines keep their ids.
+    Lines that lose a race with a concurrent cart change are retried
+    against a fresh read of the cart, and the guest cart is only dropped
+    once every line has landed.
+    """
+    guest = await guest_cart(token).get()
+    if guest is None:
+        return
+
+    pending: List[CartLine] = []
+    cart = None
+    if guest.lines:
+        products, cart = await asyncio.gather(
+            repo.products.find_by_ids((line.product_id for line in guest.lines), is_active=True),
+            repo.carts.get(user_id)
+        )
+        stock = {product_id: product.stock for product_id, product in products.items() if product.stock > 0}
+        pending = [line for line in guest.lines if line.product_id in stock]
+
+    for _ in range(GUEST_CART_MERGE_ATTEMPTS):
+        if not pending:
+            break
+        operations, targets = _merge_operations(user_id, cart, pending, stock)
+        try:
+            result = await repo.carts.bulk_write(operations)
+            # Every write matched or upserted, so every pending line has landed
+            if result is None or result.matched_count + result.upserted_count == len(operations):
+                pending = []
+                break
+        except BulkWriteError:
+            pass
+        # Retry the lines that did not land against what the cart holds now
+        cart = await repo.carts.get(user_id)
+        pending = [line for line in pending if not _merged(cart, targets[line.id])]
+
+    if not pending:
+        await repo.guest_carts.delete_many({"_id": guest.id})
+        return
+
+    # Leave the lines that could not be merged in the guest cart for the next login
+    logger.warning("Guest cart merge for user %s left %d lines in the guest cart", user_id, len(pending))
+    await repo.guest_carts.update_one(
+        {"_id": guest.id},
+        {"$pull": {"lines": {"id": {"$nin": [line.id for line in pending]}}}}
+    )
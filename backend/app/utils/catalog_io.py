@@ -0,0 +1,281 @@
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Literal, Optional, Tuple
+from datetime import datetime
+import asyncio
+import codecs
+import csv
+import io
+import json
+import os
+from pydantic import ValidationError
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from .. import repositories as repo
+from ..models import ProductImage, RatingSummary, generate_id
+from ..schemas import ProductImportError, ProductImportReport, ProductImportRow
+from .cache import invalidate_product
+from .category_index import category_index
+from .search import product_search_index
+
+# Rows validated and written per bulk_write
+IMPORT_CHUNK_SIZE = int(os.environ.get("IMPORT_CHUNK_SIZE", 1000))
+
+# Per-row errors listed in an import report; the failed count covers all of them
+IMPORT_MAX_ERRORS = int(os.environ.get("IMPORT_MAX_ERRORS", 1000))
+
+CatalogFormat = Literal["ndjson", "csv"]
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+# CSV columns; categories and images hold "|"-separated category slugs and
+# image URLs, and the first image is the primary one
+CSV_FIELDS = ["name", "slug", "description", "price", "sale_price", "stock", "is_active", "categories", "images"]
+LIST_SEPARATOR = "|"
+
+# A parsed record, or the reason it could not be parsed
+Record = Tuple[int, Any]
+
+async def _lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream into lines without holding the whole body"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer.strip():
+        yield buffer.rstrip("\r")
+
+async def _ndjson_records(lines: AsyncIterator[str]) -> AsyncIterator[Record]:
+    row = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            yield row, json.loads(line)
+        except ValueError as e:
+            yield row, ValueError(f"Invalid JSON: {e}")
+
+def _csv_row(values: Dict[str, str]) -> Dict[str, Any]:
+    """Map a CSV row onto the NDJSON record shape; empty cells fall back to defaults"""
+    record: Dict[str, Any] = {field: value for field, value in values.items() if field and value not in (None, "")}
+    if "categories" in record:
+        record["categories"] = [slug.strip() for slug in record["categories"].split(LIST_SEPARATOR) if slug.strip()]
+    if "images" in record:
+        urls = [url.strip() for url in record["images"].split(LIST_SEPARATOR) if url.strip()]
+        record["images"] = [{"image_url": url, "is_primary": index == 0} for index, url in enumerate(urls)]
+    return record
+
+async def _csv_records(lines: AsyncIterator[str]) -> AsyncIterator[Record]:
+    header: Optional[List[str]] = None
+    pending = ""
+    row = 0
+    async for line in lines:
+        # A quoted cell may span lines; an odd quote count means the record continues
+        pending = f"{pending}\n{line}" if pending else line
+        if pending.count('"') % 2:
+            continue
+        text, pending = pending, ""
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        row += 1
+        if len(values) > len(header):
+            yield row, ValueError(f"Expected {len(header)} columns, found {len(values)}")
+            continue
+        yield row, _csv_row(dict(zip(header, values)))
+    if pending:
+        yield row + 1, ValueError("Unterminated quoted field")
+
+def read_records(chunks: AsyncIterable[bytes], format: CatalogFormat) -> AsyncIterator[Record]:
+    """Numbered records from an NDJSON or CSV byte stream"""
+    lines = _lines(chunks)
+    return _csv_records(lines) if format == "csv" else _ndjson_records(lines)
+
+def _error_message(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in detail['loc']) or 'row'}: {detail['msg']}"
+            for detail in error.errors()
+        )
+    return str(error)
+
+class _Import:
+    """Running totals for one import"""
+
+    def __init__(self):
+        self.report = ProductImportReport()
+
+    def fail(self, row: int, slug: Optional[str], error: Any):
+        self.report.failed += 1
+        if len(self.report.errors) < IMPORT_MAX_ERRORS:
+            message = error if isinstance(error, str) else _error_message(error)
+            self.report.errors.append(ProductImportError(row=row, slug=slug, error=message))
+
+    async def write_chunk(self, records: List[Record]):
+        # Validate every row before touching the database
+        rows: List[Tuple[int, ProductImportRow]] = []
+        seen = set()
+        for row, record in records:
+            slug = record.get("slug") if isinstance(record, dict) else None
+            if isinstance(record, Exception):
+                self.fail(row, slug, record)
+                continue
+            try:
+                item = ProductImportRow.model_validate(record)
+            except ValidationError as e:
+                self.fail(row, slug, e)
+                continue
+            if item.slug in seen:
+                self.fail(row, item.slug, "Slug appears more than once in this chunk")
+                continue
+            seen.add(item.slug)
+            rows.append((row, item))
+        if not rows:
+            return
+
+        # One lookup for the chunk's category slugs and one for its existing products
+        category_slugs = {slug for _, item in rows for slug in item.categories}
+        categories, existing = await asyncio.gather(
+            repo.categories.project({"slug": {"$in": list(category_slugs)}}, ["slug"]),
+            repo.products.project({"slug": {"$in": [item.slug for _, item in rows]}}, ["slug", "category_ids", "is_active"])
+        )
+        category_ids = {category["slug"]: category["_id"] for category in categories}
+        existing_products = {product["slug"]: product for product in existing}
+
+        now = datetime.utcnow()
+        writes = []
+        operations = []
+        for row, item in rows:
+            missing = [slug for slug in item.categories if slug not in category_ids]
+            if missing:
+                self.fail(row, item.slug, f"Unknown categories: {', '.join(missing)}")
+                continue
+            current = existing_products.get(item.slug)
+            product_id = current["_id"] if current else generate_id()
+            # Only the fields a row gives overwrite an existing product; the
+            # defaults for the rest apply to new products alone
+            given = item.model_fields_set - {"categories", "images"}
+            fields = item.model_dump(include=given)
+            defaults = item.model_dump(exclude=given | {"categories", "images"})
+            listed = {"category_ids": [category_ids[slug] for slug in item.categories]}
+            (fields if "categories" in item.model_fields_set else defaults).update(listed)
+            fields["updated_at"] = now
+            operations.append(UpdateOne(
+                {"_id": product_id},
+                {"$set": fields, "$setOnInsert": {**defaults, "created_at": now, "rating": RatingSummary().model_dump()}},
+                upsert=True
+            ))
+            writes.append((row, item, product_id, current))
+
+        # Rows rejected by the server are reported and skipped, the rest still apply
+        failed_indexes = set()
+        try:
+            await repo.products.bulk_write(operations)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                row, item, _, _ = writes[error["index"]]
+                failed_indexes.add(error["index"])
+                self.fail(row, item.slug, error.get("errmsg", "Write failed"))
+        writes = [write for index, write in enumerate(writes) if index not in failed_indexes]
+
+        # Rows that list images replace the product's images; the rest keep theirs
+        image_rows = []
+        image_operations = []
+        for write in writes:
+            _, item, product_id, _ = write
+            for image in item.images:
+                image_rows.append(write)
+                image_operations.append(InsertOne(
+                    ProductImage(product_id=product_id, **image.model_dump()).model_dump(by_alias=True)
+                ))
+        replaced = list({product_id for _, _, product_id, _ in image_rows})
+        if replaced:
+            await repo.product_images.delete_many({"product_id": {"$in": replaced}})
+        try:
+            await repo.product_images.bulk_write(image_operations)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                row, item, _, _ = image_rows[error["index"]]
+                self.fail(row, item.slug, f"Image not saved: {error.get('errmsg', 'Write failed')}")
+
+        dirty_categories = []
+        for _, item, product_id, current in writes:
+            if current is None:
+                self.report.created += 1
+            else:
+                self.report.updated += 1
+                dirty_categories.extend(current.get("category_ids", []))
+            dirty_categories.extend(category_ids[slug] for slug in item.categories)
+            invalidate_product(product_id, item.slug)
+            is_active = item.is_active if current is None or "is_active" in item.model_fields_set else current.get("is_active", True)
+            if is_active:
+                product_search_index.add(product_id, item.name, item.description)
+            else:
+                product_search_index.remove(product_id)
+        category_index.mark_dirty(dirty_categories)
+
+async def import_products(
+    chunks: AsyncIterable[bytes],
+    format: CatalogFormat = "ndjson",
+    chunk_size: int = IMPORT_CHUNK_SIZE
+) -> ProductImportReport:
+    """Create or update products (matched by slug) from an NDJSON or CSV stream
+
+    Rows are validated and written a chunk at a time with unordered bulk
+    writes; invalid rows are reported without stopping the import. Fields
+    a row leaves out keep their current values on existing products.
+    """
+    run = _Import()
+    chunk: List[Record] = []
+    async for record in read_records(chunks, format):
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            await run.write_chunk(chunk)
+            chunk = []
+    if chunk:
+        await run.write_chunk(chunk)
+    run.report.errors.sort(key=lambda error: error.row)
+    return run.report
+
+def _csv_line(record: Dict[str, Any]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow([
+        LIST_SEPARATOR.join(record[field]) if field in ("categories", "images")
+        else "" if record[field] is None else record[field]
+        for field in CSV_FIELDS
+    ])
+    return buffer.getvalue()
+
+async def export_products(format: CatalogFormat = "ndjson", chunk_size: int = IMPORT_CHUNK_SIZE) -> AsyncIterator[str]:
+    """Every product in the import format, streamed a chunk at a time"""
+    category_slugs = {category["_id"]: category["slug"] for category in await repo.categories.project({}, ["slug"])}
+    if format == "csv":
+        yield ",".join(CSV_FIELDS) + "\r\n"
+
+    last_id = ""
+    while True:
+        # Page by _id so the export never holds more than one chunk
+        products = await repo.products.find_many({"_id": {"$gt": last_id}}, sort=[("_id", 1)], limit=chunk_size)
+        if not products:
+            break
+        last_id = products[-1].id
+        images = await repo.product_images.group_by("product_id", (product.id for product in products))
+
+        lines = []
+        for product in products:
+            product_images = sorted(images.get(product.id, []), key=lambda image: not image.is_primary)
+            record = product.model_dump(include={"name", "slug", "description", "price", "sale_price", "stock", "is_active"})
+            record["categories"] = [category_slugs[category_id] for category_id in product.category_ids if category_id in category_slugs]
+            if format == "csv":
+                record["images"] = [image.image_url for image in product_images]
+                lines.append(_csv_line(record))
+            else:
+                record["images"] = [image.model_dump(include={"image_url", "alt_text", "is_primary"}) for image in product_images]
+                lines.append(ProductImportRow.model_validate(record).model_dump_json() + "\n")
+        yield "".join(lines)
@@ -0,0 +1,165 @@
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set
+from datetime import datetime
+import asyncio
+import logging
+import os
+import time
+from .. import repositories as repo
+from ..schemas import CategorySummaryResponse
+from .conditional import make_etag
+from .responses import encode_json
+
+logger = logging.getLogger(__name__)
+
+# Full rebuild interval, which also picks up changes made by other workers (seconds)
+CATEGORY_INDEX_TTL = float(os.environ.get("CATEGORY_INDEX_TTL", 300))
+
+# Edge/browser caching for the category index response (seconds)
+CATEGORY_INDEX_MAX_AGE = int(os.environ.get("CATEGORY_INDEX_MAX_AGE", 60))
+CATEGORY_INDEX_STALE_WHILE_REVALIDATE = int(os.environ.get("CATEGORY_INDEX_STALE_WHILE_REVALIDATE", 600))
+CATEGORY_INDEX_CACHE_CONTROL = (
+    f"public, max-age={CATEGORY_INDEX_MAX_AGE}, "
+    f"stale-while-revalidate={CATEGORY_INDEX_STALE_WHILE_REVALIDATE}"
+)
+
+class CategoryIndexSnapshot(NamedTuple):
+    categories: List[Dict[str, Any]]
+    body: bytes
+    etag: str
+    last_modified: datetime
+
+def _stats_pipeline(category_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Active product count, price range and newest product per category"""
+    match: Dict[str, Any] = {"is_active": True}
+    if category_ids is not None:
+        match["category_ids"] = {"$in": category_ids}
+    pipeline: List[Dict[str, Any]] = [
+        {"$match": match},
+        {"$project": {"category_ids": 1, "price": 1, "sale_price": 1, "created_at": 1}},
+        {"$sort": {"created_at": -1}},
+        {"$unwind": "$category_ids"},
+    ]
+    if category_ids is not None:
+        pipeline.append({"$match": {"category_ids": {"$in": category_ids}}})
+    pipeline.append({
+        "$group": {
+            "_id": "$category_ids",
+            "product_count": {"$sum": 1},
+            "min_price": {"$min": {"$ifNull": ["$sale_price", "$price"]}},
+            "max_price": {"$max": {"$ifNull": ["$sale_price", "$price"]}},
+            "featured_product_id": {"$first": "$_id"},
+        }
+    })
+    return pipeline
+
+class CategoryIndex:
+    """In-memory category listing with per-category product stats
+
+    The index is pre-encoded to JSON so serving it costs no database
+    work. Product changes mark their categories dirty and only those
+    entries are recomputed, in a background task; a full rebuild runs
+    once the index is older than CATEGORY_INDEX_TTL.
+    """
+
+    def __init__(self, ttl: float = CATEGORY_INDEX_TTL):
+        self.ttl = ttl
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._snapshot: Optional[CategoryIndexSnapshot] = None
+        self._built_at = 0.0
+        self._dirty: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _compute(self, category_ids: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Index entries for the given categories, or for all of them"""
+        filters = {} if category_ids is None else {"_id": {"$in": category_ids}}
+        categories, stats = await asyncio.gather(
+            repo.categories.find_many(filters),
+            repo.products.aggregate(_stats_pipeline(category_ids))
+        )
+        stats_by_category = {row["_id"]: row for row in stats}
+        images = await repo.product_images.group_by(
+            "product_id", (row["featured_product_id"] for row in stats)
+        )
+
+        entries = {}
+        for category in categories:
+            row = stats_by_category.get(category.id, {})
+            primary_image = category.image_url
+            if primary_image is None and row:
+                product_images = images.get(row["featured_product_id"], [])
+                primary = [image for image in product_images if image.is_primary] or product_images[:1]
+                primary_image = primary[0].image_url if primary else None
+            entries[category.id] = {
+                **category.model_dump(),
+                "product_count": row.get("product_count", 0),
+                "min_price": row.get("min_price"),
+                "max_price": row.get("max_price"),
+                "primary_image": primary_image,
+            }
+        return entries
+
+    def _publish(self):
+        categories = sorted(self._entries.values(), key=lambda entry: entry["name"])
+        body = encode_json(List[CategorySummaryResponse], categories)
+        self._snapshot = CategoryIndexSnapshot(
+            categories=categories,
+            body=body,
+            etag=make_etag(body),
+            last_modified=datetime.utcnow()
+        )
+
+    async def rebuild(self):
+        """Recompute every entry from the database"""
+        self._entries = await self._compute()
+        self._built_at = time.monotonic()
+        self._publish()
+        logger.info("Category index built with %d categories", len(self._entries))
+
+    async def refresh_categories(self, category_ids: Iterable[str]):
+        """Recompute only the given categories"""
+        category_ids = list(set(category_ids))
+        if not category_ids:
+            return
+        entries = await self._compute(category_ids)
+        for category_id in category_ids:
+            if category_id in entries:
+                self._entries[category_id] = entries[category_id]
+            else:
+                self._entries.pop(category_id, None)
+        self._publish()
+
+    def _is_stale(self) -> bool:
+        return time.monotonic() - self._built_at >= self.ttl
+
+    async def _refresh(self):
+        try:
+            if self._is_stale():
+                self._dirty.clear()
+                await self.rebuild()
+            # Categories touched while a refresh was running are picked up here
+            while self._dirty:
+                category_ids, self._dirty = self._dirty, set()
+                await self.refresh_categories(category_ids)
+        except Exception:
+            logger.exception("Category index refresh failed")
+
+    def _schedule_refresh(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh())
+
+    def mark_dirty(self, category_ids: Iterable[str]):
+        """Queue categories whose products changed for a background refresh"""
+        self._dirty.update(category_ids)
+        if self._dirty and self._snapshot is not None:
+            self._schedule_refresh()
+
+    async def snapshot(self) -> CategoryIndexSnapshot:
+        """Current index, refreshing it in the background when stale or dirty"""
+        if self._snapshot is None:
+            await self.rebuild()
+        elif self._dirty or self._is_stale():
+            self._schedule_refresh()
+        return self._snapshot
+
+# Shared index for this worker process
+category_index = CategoryIndex()
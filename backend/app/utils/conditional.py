@@ -0,0 +1,83 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import hashlib
+from fastapi import Request, Response
+
+def make_etag(*parts: Any) -> str:
+    """Strong entity tag derived from the values that determine a representation"""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+def http_date(value: datetime) -> str:
+    # Stored timestamps are naive UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+def validator_headers(
+    etag: str,
+    last_modified: Optional[datetime] = None,
+    cache_control: str = "no-cache"
+) -> Dict[str, str]:
+    """Validator headers; no-cache lets clients store the body but revalidate before reuse"""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    if header.strip() == "*":
+        return True
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+def _unmodified_since(header: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    # HTTP dates only carry whole seconds
+    return last_modified.replace(microsecond=0) <= since
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """Whether the client's cached copy is still current
+
+    If-None-Match takes precedence; If-Modified-Since is only consulted
+    when the request carries no entity tags.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None and last_modified is not None:
+        return _unmodified_since(if_modified_since, last_modified)
+    return False
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    """Bodiless 304 carrying the current validators"""
+    return Response(status_code=304, headers=headers)
+
+async def collection_fingerprint(repository) -> Tuple[int, Optional[datetime]]:
+    """Document count and newest modification time of a collection
+
+    Both come from cheap lookups (collection metadata and the top of the
+    repository's timestamp_field index), so list endpoints can be
+    revalidated without running their query. Repositories without a
+    timestamp_field are only ever appended to and fingerprint by count.
+    """
+    modified_field = repository.timestamp_field
+    if modified_field is None:
+        return await repository.estimated_count(), None
+    count, latest = await asyncio.gather(
+        repository.estimated_count(),
+        repository.project({}, [modified_field], sort=[(modified_field, -1)], limit=1)
+    )
+    last_modified = latest[0].get(modified_field) if latest else None
+    return count, last_modified
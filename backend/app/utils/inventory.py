@@ -0,0 +1,81 @@
+from typing import Dict, Iterable, Tuple
+from datetime import datetime
+import asyncio
+from pymongo import UpdateOne
+from .. import repositories as repo
+from .cache import invalidate_product
+
+class InsufficientStock(Exception):
+    """Raised when a product cannot cover the requested quantity"""
+
+    def __init__(self, product_id: str, quantity: int):
+        super().__init__(f"Not enough stock for product {product_id}")
+        self.product_id = product_id
+        self.quantity = quantity
+
+def merge_lines(lines: Iterable[Tuple[str, int]]) -> Dict[str, int]:
+    """Sum quantities per product so repeated lines are checked together"""
+    merged: Dict[str, int] = {}
+    for product_id, quantity in lines:
+        merged[product_id] = merged.get(product_id, 0) + quantity
+    return merged
+
+async def _take(product_id: str, quantity: int, session=None) -> bool:
+    # Conditional decrement: only matches while enough stock is left
+    result = await repo.products.find_one_and_update(
+        {"_id": product_id, "is_active": True, "stock": {"$gte": quantity}},
+        # Stock is part of the catalog representation, so bump updated_at too
+        {"$inc": {"stock": -quantity}, "$set": {"updated_at": datetime.utcnow()}},
+        projection={"_id": 1},
+        session=session
+    )
+    return result is not None
+
+async def reserve_stock(lines: Dict[str, int], session=None):
+    """Atomically take stock for every line, or for none of them
+
+    Each product is decremented with its own conditional $inc, so
+    concurrent checkouts on the same product never oversell and never
+    wait on a lock. The updates run concurrently; if any line fails,
+    the lines already taken are given back in one bulk write and
+    InsufficientStock is raised for the failing product.
+
+    Inside a transaction (session given) the updates run one after
+    another, since a session cannot carry concurrent operations.
+    """
+    lines = {product_id: quantity for product_id, quantity in lines.items() if quantity > 0}
+    if not lines:
+        return
+
+    if session is None:
+        results = await asyncio.gather(*[
+            _take(product_id, quantity) for product_id, quantity in lines.items()
+        ])
+    else:
+        results = [await _take(product_id, quantity, session) for product_id, quantity in lines.items()]
+    taken = {
+        product_id: quantity
+        for (product_id, quantity), ok in zip(lines.items(), results)
+        if ok
+    }
+    for product_id in taken:
+        invalidate_product(product_id)
+
+    if len(taken) < len(lines):
+        await release_stock(taken, session)
+        failed = next(product_id for product_id in lines if product_id not in taken)
+        raise InsufficientStock(failed, lines[failed])
+
+async def release_stock(lines: Dict[str, int], session=None):
+    """Give stock back for every line in a single unordered bulk write"""
+    now = datetime.utcnow()
+    operations = [
+        UpdateOne({"_id": product_id}, {"$inc": {"stock": quantity}, "$set": {"updated_at": now}})
+        for product_id, quantity in lines.items()
+        if quantity > 0
+    ]
+    if not operations:
+        return
+    await repo.products.bulk_write(operations, session=session)
+    for product_id in lines:
+        invalidate_product(product_id)
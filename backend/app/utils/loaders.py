@@ -0,0 +1,99 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List
+import asyncio
+from .. import repositories as repo
+from ..models import CartLine, Order
+
+class BatchLoader:
+    """Memoizing loader that resolves every not-yet-seen key with one batch call"""
+
+    def __init__(self, batch_fn: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]]):
+        self._batch_fn = batch_fn
+        self._cache: Dict[Hashable, Any] = {}
+
+    async def load_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        keys = list(dict.fromkeys(keys))
+        missing = [key for key in keys if key not in self._cache]
+        if missing:
+            found = await self._batch_fn(missing)
+            for key in missing:
+                self._cache[key] = found.get(key)
+        return {key: self._cache[key] for key in keys if self._cache[key] is not None}
+
+class ResponseLoader:
+    """Request-scoped loader that assembles nested cart and order responses
+
+    Each kind of related document (products, categories, images,
+    addresses, order lines) is fetched with a single $in query no matter
+    how many cart or order lines reference it.
+    """
+
+    def __init__(self):
+        self._products = BatchLoader(repo.products.find_by_ids)
+        self._categories = BatchLoader(repo.categories.find_by_ids)
+        self._images = BatchLoader(lambda ids: repo.product_images.group_by("product_id", ids))
+        self._addresses = BatchLoader(repo.addresses.find_by_ids)
+        self._order_items = BatchLoader(lambda ids: repo.order_items.group_by("order_id", ids))
+
+    async def load_products(self, product_ids: Iterable[str]) -> Dict[str, dict]:
+        """Products with their categories and images embedded, keyed by id"""
+        products = await self._products.load_many(product_ids)
+        category_ids = {category_id for product in products.values() for category_id in product.category_ids}
+        categories, images = await asyncio.gather(
+            self._categories.load_many(category_ids),
+            self._images.load_many(products.keys())
+        )
+        return {
+            product_id: {
+                **product.model_dump(),
+                "categories": [
+                    categories[category_id].model_dump()
+                    for category_id in product.category_ids
+                    if category_id in categories
+                ],
+                "images": [image.model_dump() for image in images.get(product_id, [])]
+            }
+            for product_id, product in products.items()
+        }
+
+    async def load_cart(self, lines: List[CartLine]) -> List[dict]:
+        """Cart lines with their products embedded, skipping unknown products"""
+        products = await self.load_products(line.product_id for line in lines)
+        return [
+            {**line.model_dump(), "product": products[line.product_id]}
+            for line in lines
+            if line.product_id in products
+        ]
+
+    async def load_orders(self, orders: List[Order]) -> List[dict]:
+        """Orders with their address, lines and line products embedded
+
+        Orders stored with embedded snapshots need no further queries.
+        """
+        referenced = [order for order in orders if order.items is None or order.address is None]
+        addresses, order_items = await asyncio.gather(
+            self._addresses.load_many(order.address_id for order in referenced),
+            self._order_items.load_many(order.id for order in referenced)
+        )
+        products = await self.load_products(
+            item.product_id for items in order_items.values() for item in items
+        )
+
+        responses = []
+        for order in orders:
+            if order.items is not None and order.address is not None:
+                responses.append(order.model_dump())
+                continue
+            responses.append({
+                **order.model_dump(),
+                "address": addresses.get(order.address_id),
+                "items": [
+                    {**item.model_dump(), "product": products[item.product_id]}
+                    for item in order_items.get(order.id, [])
+                    if item.product_id in products
+                ]
+            })
+        return responses
+
+def get_response_loader() -> ResponseLoader:
+    """Dependency providing a fresh loader for each request"""
+    return ResponseLoader()
@@ -0,0 +1,142 @@
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+import bisect
+import threading
+
+# Default latency buckets (seconds)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+LabelValues = Tuple[str, ...]
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """Labelled metric family rendered in the Prometheus text format
+
+    Updates may come from pymongo's monitoring threads as well as the
+    event loop, so they take a lock.
+    """
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+
+class Counter(Metric):
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+            for labels, value in sorted(values.items())
+        ]
+
+class Gauge(Counter):
+    metric_type = "gauge"
+
+    def dec(self, *label_values: str, amount: float = 1):
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, value: float, *label_values: str):
+        with self._lock:
+            self._values[label_values] = value
+
+class CallbackMetric(Metric):
+    """Metric whose samples are read from existing state when scraped"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        metric_type: str,
+        callback: Callable[[], Iterable[Tuple[LabelValues, float]]],
+        labels: Sequence[str] = ()
+    ):
+        super().__init__(name, documentation, labels)
+        self.metric_type = metric_type
+        self.callback = callback
+
+    def collect(self) -> List[str]:
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+            for labels, value in self.callback()
+        ]
+
+class Histogram(Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, *label_values: str):
+        # Per series: one count per bucket plus +Inf, then the sum
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def collect(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for label_values, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, label_values, le)} {cumulative}")
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {values[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class Registry:
+    """Metrics exposed on /metrics"""
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+# Shared registry for this worker process
+registry = Registry()
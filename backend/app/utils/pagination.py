@@ -0,0 +1,85 @@
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime
+from fastapi import HTTPException, status
+import base64
+import json
+
+# Response header carrying the cursor for the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "dt" in value:
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+def _get(item: Any, field: str) -> Any:
+    # Dotted fields such as "rating.average" walk into embedded documents
+    for part in field.split("."):
+        if item is None:
+            return None
+        item = item.get(part) if isinstance(item, dict) else getattr(item, part)
+    return item
+
+def encode_cursor(sort_field: str, direction: int, value: Any, last_id: str) -> str:
+    """Encode the last seen (sort key, id) pair as an opaque cursor"""
+    payload = {"s": sort_field, "d": direction, "v": _encode_value(value), "id": last_id}
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, sort_field: str, direction: int) -> Tuple[Any, str]:
+    """Decode a cursor, checking it was issued for the same sort order"""
+    invalid_cursor = HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Invalid cursor"
+    )
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        value = _decode_value(payload["v"])
+        last_id = payload["id"]
+    except (ValueError, KeyError, TypeError):
+        raise invalid_cursor
+
+    if payload.get("s") != sort_field or payload.get("d") != direction:
+        raise invalid_cursor
+    return value, last_id
+
+def keyset_filter(sort_field: str, direction: int, value: Any, last_id: str) -> Dict[str, Any]:
+    """Filter matching documents strictly after (value, last_id) in sort order
+
+    MongoDB sorts a missing or null sort field below every other value
+    (for example a product with no rating.average), but $gt/$lt never
+    match it, so that position is spelled out explicitly.
+    """
+    op = "$gt" if direction == 1 else "$lt"
+    conditions: List[Dict[str, Any]] = [{sort_field: value, "_id": {op: last_id}}]
+    if value is None:
+        # Ascending, every present value comes after the missing ones
+        if direction == 1:
+            conditions.insert(0, {sort_field: {"$ne": None}})
+    else:
+        conditions.insert(0, {sort_field: {op: value}})
+        # Descending, the missing ones come after every present value
+        if direction == -1:
+            conditions.append({sort_field: None})
+    return {"$or": conditions}
+
+def cursor_filter(cursor: Optional[str], sort_field: str, direction: int) -> Dict[str, Any]:
+    """Keyset filter for a request's cursor, or an empty filter without one"""
+    if not cursor:
+        return {}
+    value, last_id = decode_cursor(cursor, sort_field, direction)
+    return keyset_filter(sort_field, direction, value, last_id)
+
+def next_cursor(items: List[Any], sort_field: str, direction: int, limit: int) -> Optional[str]:
+    """Cursor pointing past the last item, or None when the page is not full"""
+    if not items or len(items) < limit:
+        return None
+    last = items[-1]
+    last_id = last["_id"] if isinstance(last, dict) and "_id" in last else _get(last, "id")
+    return encode_cursor(sort_field, direction, _get(last, sort_field), last_id)
@@ -0,0 +1,200 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+# Sortable product fields exposed through the API, mapped to document fields
+PRODUCT_SORT_FIELDS = {
+    "created_at": "created_at",
+    "price": "price",
+    "name": "name",
+    "rating": "rating.average",
+}
+
+# Computed field holding a product's position in the search ranking
+RELEVANCE_FIELD = "_relevance"
+
+# Fields a product card needs; the sort field is kept as well for cursors
+CARD_FIELDS = ("name", "slug", "price", "sale_price", "rating.count", "rating.average")
+
+# Lower bounds of the price facet buckets; prices from the last bound up
+# fall into the open-ended overflow bucket
+PRICE_BUCKET_BOUNDARIES = [0, 100, 250, 500, 1000, 2500]
+PRICE_BUCKET_OVERFLOW = "overflow"
+
+def product_sort_key(sort_by: Optional[str], sort_order: Optional[str]) -> Tuple[str, int]:
+    """Resolve the requested sort into a (field, direction) pair"""
+    if sort_by == "relevance":
+        # Rank positions ascend from the best match
+        return RELEVANCE_FIELD, 1
+    field = PRODUCT_SORT_FIELDS.get(sort_by, "created_at")
+    direction = 1 if sort_order == "asc" else -1
+    return field, direction
+
+def product_sort_spec(sort_by: Optional[str], sort_order: Optional[str]) -> Dict[str, int]:
+    """Build a deterministic sort spec, using _id as the tiebreaker"""
+    field, direction = product_sort_key(sort_by, sort_order)
+    return {field: direction, "_id": direction}
+
+def product_lookup_stages() -> List[Dict[str, Any]]:
+    """Stages that embed categories and images into each product"""
+    return [
+        {
+            "$lookup": {
+                "from": "categories",
+                "localField": "category_ids",
+                "foreignField": "_id",
+                "as": "categories",
+            }
+        },
+        {
+            "$lookup": {
+                "from": "product_images",
+                "localField": "_id",
+                "foreignField": "product_id",
+                "as": "images",
+            }
+        },
+    ]
+
+def card_lookup_stages() -> List[Dict[str, Any]]:
+    """Stages that embed only the primary (or else first) image into each product"""
+    return [
+        {
+            "$lookup": {
+                "from": "product_images",
+                "let": {"product_id": "$_id"},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$product_id", "$$product_id"]}}},
+                    {"$sort": {"is_primary": -1, "_id": 1}},
+                    {"$limit": 1},
+                ],
+                "as": "images",
+            }
+        },
+    ]
+
+def _price_filter(min_price: Optional[float], max_price: Optional[float]) -> Dict[str, Any]:
+    """Match conditions for a price range"""
+    price: Dict[str, float] = {}
+    if min_price is not None:
+        price["$gte"] = min_price
+    if max_price is not None:
+        price["$lte"] = max_price
+    return {"price": price} if price else {}
+
+def _page_stages(
+    skip: int,
+    limit: int,
+    ranked_ids: Optional[List[str]],
+    sort_by: Optional[str],
+    sort_order: Optional[str],
+    view: str,
+) -> List[Dict[str, Any]]:
+    """Project, sort, paginate and embed one page of already filtered products"""
+    stages: List[Dict[str, Any]] = []
+    sort = product_sort_spec(sort_by, sort_order)
+
+    # Drop unused fields before sorting so they never leave the server
+    if view == "card":
+        fields = set(CARD_FIELDS) | (set(sort) - {RELEVANCE_FIELD})
+        stages.append({"$project": {field: 1 for field in sorted(fields)}})
+
+    if RELEVANCE_FIELD in sort:
+        stages.append({
+            "$addFields": {RELEVANCE_FIELD: {"$indexOfArray": [ranked_ids or [], "$_id"]}}
+        })
+
+    # Sort and paginate before joining so only the page is embedded
+    stages += [
+        {"$sort": sort},
+        {"$skip": skip},
+        {"$limit": limit},
+    ]
+    stages += card_lookup_stages() if view == "card" else product_lookup_stages()
+    return stages
+
+def product_listing_pipeline(
+    skip: int = 0,
+    limit: int = 10,
+    category_id: Optional[str] = None,
+    ranked_ids: Optional[List[str]] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    sort_by: Optional[str] = "created_at",
+    sort_order: Optional[str] = "desc",
+    keyset: Optional[Dict[str, Any]] = None,
+    view: str = "detail",
+) -> List[Dict[str, Any]]:
+    """Build the aggregation pipeline behind the product listing
+
+    ranked_ids restricts the listing to search hits, best match first.
+    The card view projects away everything a product grid does not show.
+    """
+    match: Dict[str, Any] = {"is_active": True, **_price_filter(min_price, max_price)}
+
+    # Filter on the category id directly so the sort and limit can use an index
+    if category_id:
+        match["category_ids"] = category_id
+
+    # Apply search filter
+    if ranked_ids is not None:
+        match["_id"] = {"$in": ranked_ids}
+
+    # Resume after the cursor position
+    if keyset:
+        match["$and"] = [keyset]
+
+    return [{"$match": match}] + _page_stages(skip, limit, ranked_ids, sort_by, sort_order, view)
+
+def product_facets_pipeline(
+    skip: int = 0,
+    limit: int = 10,
+    category_id: Optional[str] = None,
+    ranked_ids: Optional[List[str]] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    sort_by: Optional[str] = "created_at",
+    sort_order: Optional[str] = "desc",
+    keyset: Optional[Dict[str, Any]] = None,
+    view: str = "detail",
+) -> List[Dict[str, Any]]:
+    """Build one aggregation returning a listing page, its total and facet counts
+
+    Each facet ignores its own filter so the sidebar can show how many
+    products every alternative value would return: category counts
+    honour the price range, price bucket counts honour the category.
+    """
+    match: Dict[str, Any] = {"is_active": True}
+    if ranked_ids is not None:
+        match["_id"] = {"$in": ranked_ids}
+
+    price = _price_filter(min_price, max_price)
+    in_category = {"category_ids": category_id} if category_id else {}
+    items_match: Dict[str, Any] = {**in_category, **price}
+    if keyset:
+        items_match["$and"] = [keyset]
+
+    return [
+        {"$match": match},
+        {
+            "$facet": {
+                "items": [{"$match": items_match}]
+                + _page_stages(skip, limit, ranked_ids, sort_by, sort_order, view),
+                "total": [{"$match": {**in_category, **price}}, {"$count": "count"}],
+                "categories": [
+                    {"$match": price},
+                    {"$unwind": "$category_ids"},
+                    {"$group": {"_id": "$category_ids", "count": {"$sum": 1}}},
+                ],
+                "price": [
+                    {"$match": in_category},
+                    {
+                        "$bucket": {
+                            "groupBy": "$price",
+                            "boundaries": PRICE_BUCKET_BOUNDARIES,
+                            "default": PRICE_BUCKET_OVERFLOW,
+                            "output": {"count": {"$sum": 1}},
+                        }
+                    },
+                ],
+            }
+        },
+    ]
@@ -0,0 +1,166 @@
+from typing import Any, Dict, Optional, Tuple
+from contextvars import ContextVar
+import logging
+import os
+import threading
+from pymongo import monitoring
+from .metrics import Histogram, registry
+from .telemetry import route_template
+
+logger = logging.getLogger(__name__)
+
+# Record per-request database timings
+DB_PROFILING = os.environ.get("DB_PROFILING", "true").lower() == "true"
+
+# Log commands slower than this (milliseconds)
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", 100))
+
+# Log requests that issue more commands than this, usually an N+1 loop
+REQUEST_QUERY_WARN_COUNT = int(os.environ.get("REQUEST_QUERY_WARN_COUNT", 20))
+
+# Commands that are connection housekeeping rather than queries
+IGNORED_COMMANDS = {
+    "hello", "ismaster", "isMaster", "ping", "buildInfo", "buildinfo",
+    "saslStart", "saslContinue", "endSessions", "killCursors",
+}
+
+# Fields of each command that describe which documents it touches
+SHAPE_FIELDS = ("filter", "sort", "pipeline", "query", "updates", "deletes")
+
+db_command_seconds = registry.register(Histogram(
+    "mongodb_command_duration_seconds",
+    "MongoDB command latency",
+    labels=("command", "collection")
+))
+request_db_seconds = registry.register(Histogram(
+    "http_request_db_duration_seconds",
+    "Total MongoDB time spent per request",
+    labels=("method", "route")
+))
+request_db_queries = registry.register(Histogram(
+    "http_request_db_queries",
+    "MongoDB commands issued per request",
+    labels=("method", "route"),
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+))
+
+def query_shape(value: Any) -> Any:
+    """Replace literal values with placeholders, keeping field names and operators"""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = []
+        for item in value:
+            shape = query_shape(item)
+            # Batches of identical statements collapse to one
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    return "?"
+
+class RequestProfile:
+    """Database activity of one request"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_command: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def record(self, description: str, seconds: float):
+        with self._lock:
+            self.queries += 1
+            self.db_seconds += seconds
+            if seconds > self.slowest_seconds:
+                self.slowest_seconds = seconds
+                self.slowest_command = description
+
+    def server_timing(self) -> str:
+        """Server-Timing header value (durations in milliseconds)"""
+        timings = [f'db;dur={self.db_seconds * 1000:.2f};desc="{self.queries} queries"']
+        if self.slowest_command is not None:
+            timings.append(f'db-slowest;dur={self.slowest_seconds * 1000:.2f};desc="{self.slowest_command}"')
+        return ", ".join(timings)
+
+# Profile of the request being handled; Motor copies the context into the
+# thread that runs each command, so the listener sees the caller's request
+current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("current_profile", default=None)
+
+class CommandProfiler(monitoring.CommandListener):
+    """Times every MongoDB command and attributes it to the current request"""
+
+    def __init__(self):
+        self._pending: Dict[Tuple[Any, int], Tuple[str, str, Any, Optional[RequestProfile]]] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        collection = event.command.get(event.command_name)
+        collection = collection if isinstance(collection, str) else ""
+        shape = {field: event.command[field] for field in SHAPE_FIELDS if field in event.command}
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (
+                event.command_name, collection, shape, current_profile.get()
+            )
+
+    def _finish(self, event, failed: bool = False):
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        command, collection, shape, profile = pending
+        seconds = event.duration_micros / 1_000_000
+        db_command_seconds.observe(seconds, command, collection)
+        if profile is not None:
+            profile.record(f"{command} {collection}".strip(), seconds)
+        if seconds * 1000 >= SLOW_QUERY_MS or failed:
+            logger.warning(
+                "%s %s %s in %.1fms: %s",
+                "Failed" if failed else "Slow", command, collection, seconds * 1000, query_shape(shape)
+            )
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finish(event)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finish(event, failed=True)
+
+# Listener registered on the Motor client
+command_profiler = CommandProfiler()
+
+class DBProfilingMiddleware:
+    """Adds a Server-Timing header with the request's database time and records it per route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not DB_PROFILING:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+
+        async def send_with_timing(message):
+            # Commands still running after the headers go out are only counted in the metrics
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", profile.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_profile.reset(token)
+            route = route_template(scope)
+            request_db_seconds.observe(profile.db_seconds, scope["method"], route)
+            request_db_queries.observe(profile.queries, scope["method"], route)
+            if profile.queries > REQUEST_QUERY_WARN_COUNT:
+                logger.warning(
+                    "%s %s issued %d queries (%.1fms), slowest: %s",
+                    scope["method"], route, profile.queries, profile.db_seconds * 1000, profile.slowest_command
+                )
@@ -0,0 +1,47 @@
+from typing import Any, Dict, Optional
+from datetime import datetime
+from .. import repositories as repo
+from .cache import invalidate_product
+
+def _average(rating: Dict[str, Any]) -> float:
+    count = rating.get("count", 0)
+    return round(rating.get("sum", 0) / count, 4) if count > 0 else 0.0
+
+async def record_rating(
+    product_id: str,
+    added: Optional[int] = None,
+    removed: Optional[int] = None,
+    session=None
+):
+    """Apply a review being added, removed or changed to a product's rating summary
+
+    Counts, sum and histogram move with a single atomic $inc. The average
+    is then written only if no other review landed in between, in which
+    case that review's own update writes it instead.
+    """
+    if added == removed:
+        return
+    inc: Dict[str, int] = {
+        "rating.count": (added is not None) - (removed is not None),
+        "rating.sum": (added or 0) - (removed or 0),
+    }
+    if added is not None:
+        inc[f"rating.histogram.{added}"] = 1
+    if removed is not None:
+        inc[f"rating.histogram.{removed}"] = -1
+    inc = {field: delta for field, delta in inc.items() if delta}
+
+    product = await repo.products.find_one_and_update(
+        {"_id": product_id},
+        {"$inc": inc, "$set": {"updated_at": datetime.utcnow()}},
+        projection={"rating": 1},
+        session=session
+    )
+    if product is not None:
+        rating = product["rating"]
+        await repo.products.update_one(
+            {"_id": product_id, "rating.count": rating.get("count", 0), "rating.sum": rating.get("sum", 0)},
+            {"$set": {"rating.average": _average(rating)}},
+            session=session
+        )
+    invalidate_product(product_id)
@@ -0,0 +1,39 @@
+from functools import lru_cache
+from typing import Any, Dict, Optional
+import os
+from fastapi import Response
+from pydantic import TypeAdapter
+
+# Serve hot read endpoints through the fast path; set to false to fall back
+# to FastAPI's regular response_model handling
+FAST_JSON_RESPONSES = os.environ.get("FAST_JSON_RESPONSES", "true").lower() == "true"
+
+@lru_cache(maxsize=None)
+def _adapter(response_type: Any) -> TypeAdapter:
+    return TypeAdapter(response_type)
+
+def encode_json(response_type: Any, content: Any) -> bytes:
+    """Validate content against a response type once and encode it straight to bytes"""
+    adapter = _adapter(response_type)
+    return adapter.dump_json(adapter.validate_python(content))
+
+def fast_json(
+    response_type: Any,
+    content: Any,
+    status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None
+) -> Any:
+    """Return a pre-encoded JSON response, or the raw content when the fast path is off
+
+    Returning a Response makes FastAPI skip its own response_model
+    validation and JSON encoding, which is where listing pages spend most
+    of their serialization time.
+    """
+    if not FAST_JSON_RESPONSES:
+        return content
+    return Response(
+        content=encode_json(response_type, content),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json"
+    )
@@ -0,0 +1,241 @@
+from typing import Dict, List, Optional, Set, Tuple
+from datetime import datetime, timedelta
+from bisect import bisect_left
+import logging
+import math
+import re
+import time
+from .. import repositories as repo
+
+logger = logging.getLogger(__name__)
+
+# Name matches count more than description matches
+NAME_WEIGHT = 3
+DESCRIPTION_WEIGHT = 1
+
+# Score multipliers for expanded (non-exact) query terms
+PREFIX_WEIGHT = 0.8
+FUZZY_WEIGHT = 0.6
+
+# Upper bound on ranked ids handed to the database
+MAX_RESULTS = 1000
+
+# How often a worker pulls changes made by other workers (seconds)
+SYNC_INTERVAL = 30
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercase word tokens of a piece of text"""
+    if not text:
+        return []
+    return _TOKEN_RE.findall(text.lower())
+
+def _max_edits(term: str) -> int:
+    """Typo budget for a query term, growing with its length"""
+    if len(term) < 4:
+        return 0
+    if len(term) < 8:
+        return 1
+    return 2
+
+def _within_distance(a: str, b: str, max_dist: int) -> bool:
+    """Bounded edit distance check counting adjacent swaps as one typo"""
+    if abs(len(a) - len(b)) > max_dist:
+        return False
+    before_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i]
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            distance = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (before_previous is not None and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                distance = min(distance, before_previous[j - 2] + 1)
+            current.append(distance)
+        if min(current) > max_dist:
+            return False
+        before_previous, previous = previous, current
+    return previous[-1] <= max_dist
+
+class ProductSearchIndex:
+    """In-process inverted index over product names and descriptions with BM25 ranking"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.clear()
+
+    def __len__(self) -> int:
+        return len(self._doc_len)
+
+    def clear(self):
+        """Empty the index"""
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_terms: Dict[str, Set[str]] = {}
+        self._doc_len: Dict[str, int] = {}
+        self._total_len = 0
+        self._vocab: List[str] = []
+        self._vocab_dirty = False
+        self._synced_at: Optional[datetime] = None
+        self._checked_at = 0.0
+
+    def add(self, product_id: str, name: str, description: Optional[str]):
+        """Index a product, replacing any previous entry for it"""
+        self.remove(product_id)
+
+        counts: Dict[str, int] = {}
+        for term in tokenize(name):
+            counts[term] = counts.get(term, 0) + NAME_WEIGHT
+        for term in tokenize(description):
+            counts[term] = counts.get(term, 0) + DESCRIPTION_WEIGHT
+        if not counts:
+            return
+
+        for term, tf in counts.items():
+            postings = self._postings.setdefault(term, {})
+            if not postings:
+                self._vocab_dirty = True
+            postings[product_id] = tf
+        self._doc_terms[product_id] = set(counts)
+        self._doc_len[product_id] = sum(counts.values())
+        self._total_len += self._doc_len[product_id]
+
+    def remove(self, product_id: str):
+        """Drop a product from the index if present"""
+        terms = self._doc_terms.pop(product_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings[term]
+            postings.pop(product_id, None)
+            if not postings:
+                del self._postings[term]
+                self._vocab_dirty = True
+        self._total_len -= self._doc_len.pop(product_id)
+
+    def index_product(self, product):
+        """Index or drop a Product document depending on whether it is active"""
+        if product.is_active:
+            self.add(product.id, product.name, product.description)
+        else:
+            self.remove(product.id)
+
+    def _sorted_vocab(self) -> List[str]:
+        if self._vocab_dirty:
+            self._vocab = sorted(self._postings)
+            self._vocab_dirty = False
+        return self._vocab
+
+    def _prefix_terms(self, prefix: str) -> List[str]:
+        vocab = self._sorted_vocab()
+        terms = []
+        for i in range(bisect_left(vocab, prefix), len(vocab)):
+            if not vocab[i].startswith(prefix):
+                break
+            terms.append(vocab[i])
+        return terms
+
+    def _fuzzy_terms(self, term: str) -> List[str]:
+        max_dist = _max_edits(term)
+        if max_dist == 0:
+            return []
+        # Assume the first letter is right to keep the candidate set small
+        return [
+            candidate for candidate in self._prefix_terms(term[0])
+            if _within_distance(term, candidate, max_dist)
+        ]
+
+    def _expand(self, term: str, is_prefix: bool) -> Dict[str, float]:
+        """Map a query term to the indexed terms it matches and their weights"""
+        expansions: Dict[str, float] = {}
+        if term in self._postings:
+            expansions[term] = 1.0
+        if is_prefix:
+            for candidate in self._prefix_terms(term):
+                expansions.setdefault(candidate, PREFIX_WEIGHT)
+        if not expansions:
+            for candidate in self._fuzzy_terms(term):
+                expansions[candidate] = FUZZY_WEIGHT
+        return expansions
+
+    def _bm25(self, term: str, tf: int, doc_len: int, avg_len: float) -> float:
+        df = len(self._postings[term])
+        idf = math.log(1 + (len(self._doc_len) - df + 0.5) / (df + 0.5))
+        norm = tf + self.k1 * (1 - self.b + self.b * doc_len / avg_len)
+        return idf * tf * (self.k1 + 1) / norm
+
+    def search(self, query: str, limit: int = MAX_RESULTS) -> List[Tuple[str, float]]:
+        """Rank products matching every query term, best first
+
+        The last term also matches as a prefix so partially typed words
+        hit, and terms with no exact match fall back to near spellings.
+        """
+        terms = tokenize(query)
+        if not terms or not self._doc_len:
+            return []
+        # A trailing space means the last word is complete
+        last_is_prefix = not query[-1:].isspace()
+        avg_len = self._total_len / len(self._doc_len)
+
+        scores: Optional[Dict[str, float]] = None
+        for position, term in enumerate(terms):
+            is_prefix = last_is_prefix and position == len(terms) - 1
+            term_scores: Dict[str, float] = {}
+            for candidate, weight in self._expand(term, is_prefix).items():
+                for product_id, tf in self._postings[candidate].items():
+                    score = weight * self._bm25(candidate, tf, self._doc_len[product_id], avg_len)
+                    if score > term_scores.get(product_id, 0.0):
+                        term_scores[product_id] = score
+
+            # Every query term has to match
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {
+                    product_id: score + term_scores[product_id]
+                    for product_id, score in scores.items()
+                    if product_id in term_scores
+                }
+            if not scores:
+                return []
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+    async def rebuild(self):
+        """Load every active product from the database into a fresh index"""
+        self.clear()
+        started = datetime.utcnow()
+        for doc in await repo.products.project({"is_active": True}, ["name", "description"]):
+            self.add(doc["_id"], doc.get("name"), doc.get("description"))
+        self._synced_at = started
+        self._checked_at = time.monotonic()
+        logger.info("Product search index built with %d products", len(self))
+
+    async def sync(self):
+        """Apply product changes made elsewhere (e.g. other workers) since the last sync"""
+        if time.monotonic() - self._checked_at < SYNC_INTERVAL:
+            return
+        if self._synced_at is None:
+            await self.rebuild()
+            return
+
+        self._checked_at = time.monotonic()
+        started = datetime.utcnow()
+        # Overlap slightly to allow for clock skew between workers
+        since = self._synced_at - timedelta(seconds=SYNC_INTERVAL)
+        changed = await repo.products.project(
+            {"updated_at": {"$gt": since}},
+            ["name", "description", "is_active"]
+        )
+        for doc in changed:
+            if doc.get("is_active", True):
+                self.add(doc["_id"], doc.get("name"), doc.get("description"))
+            else:
+                self.remove(doc["_id"])
+        self._synced_at = started
+
+# Shared index for this worker process
+product_search_index = ProductSearchIndex()
@@ -0,0 +1,30 @@
+from typing import Dict, Iterable, List
+from .. import repositories as repo
+from ..models import (
+    Address, AddressSnapshot, OrderLine, Product, ProductImage,
+    ProductImageSnapshot, ProductSnapshot
+)
+
+async def load_images(product_ids: Iterable[str]) -> Dict[str, List[ProductImage]]:
+    """Images for a set of products in one query, grouped by product"""
+    return await repo.product_images.group_by("product_id", product_ids)
+
+def address_snapshot(address: Address) -> AddressSnapshot:
+    return AddressSnapshot(**address.model_dump())
+
+def product_snapshot(product: Product, images: List[ProductImage]) -> ProductSnapshot:
+    """Copy of the product as sold, keeping only its primary image"""
+    primary = [image for image in images if image.is_primary] or images[:1]
+    return ProductSnapshot(
+        **product.model_dump(include={"id", "name", "slug", "description", "price", "sale_price", "created_at"}),
+        images=[ProductImageSnapshot(**image.model_dump()) for image in primary]
+    )
+
+def order_line(product: Product, images: List[ProductImage], quantity: int, price: float, **kwargs) -> OrderLine:
+    return OrderLine(
+        product_id=product.id,
+        quantity=quantity,
+        price=price,
+        product=product_snapshot(product, images),
+        **kwargs
+    )
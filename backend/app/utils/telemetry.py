@@ -0,0 +1,167 @@
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import os
+import threading
+import time
+from pymongo import monitoring
+from starlette.routing import Match
+from .cache import product_cache, token_cache, principal_cache
+from .metrics import CallbackMetric, Counter, Gauge, Histogram, registry
+
+# How often the event loop lag probe wakes up (seconds)
+LOOP_LAG_INTERVAL = float(os.environ.get("LOOP_LAG_INTERVAL", 0.5))
+
+http_requests = registry.register(Counter(
+    "http_requests_total",
+    "HTTP requests by route template and status code",
+    labels=("method", "route", "status")
+))
+http_request_seconds = registry.register(Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency, until the response body is sent",
+    labels=("method", "route")
+))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being handled",
+    labels=("method", "route")
+))
+event_loop_lag_seconds = registry.register(Histogram(
+    "event_loop_lag_seconds",
+    "Delay between when the loop lag probe was due and when it ran",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+))
+pool_checkout_seconds = registry.register(Histogram(
+    "mongodb_pool_checkout_duration_seconds",
+    "Time spent waiting for a MongoDB connection from the pool",
+    labels=("outcome",)
+))
+pool_connections_checked_out = registry.register(Gauge(
+    "mongodb_pool_connections_checked_out",
+    "MongoDB connections currently checked out of the pool"
+))
+
+# In-process caches reported on /metrics
+CACHES = {
+    "product": product_cache,
+    "token": token_cache,
+    "principal": principal_cache,
+}
+
+def _cache_samples(field: str):
+    def samples():
+        return [((name,), cache.stats()[field]) for name, cache in CACHES.items()]
+    return samples
+
+registry.register(CallbackMetric("cache_hits_total", "Cache lookups that found a live entry", "counter", _cache_samples("hits"), labels=("cache",)))
+registry.register(CallbackMetric("cache_misses_total", "Cache lookups that missed or found an expired entry", "counter", _cache_samples("misses"), labels=("cache",)))
+registry.register(CallbackMetric("cache_evictions_total", "Entries evicted to stay within the cache size", "counter", _cache_samples("evictions"), labels=("cache",)))
+registry.register(CallbackMetric("cache_entries", "Entries currently held", "gauge", _cache_samples("size"), labels=("cache",)))
+registry.register(CallbackMetric("cache_hit_ratio", "Hits over lookups since startup", "gauge", _cache_samples("hit_ratio"), labels=("cache",)))
+
+def route_template(scope) -> str:
+    """Path template of the route that handles (or will handle) the request"""
+    # Set by the router once the request has been dispatched
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # Unmatched paths share one label so cardinality stays bounded
+    app = scope.get("app")
+    for route in getattr(getattr(app, "router", None), "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+class RequestMetricsMiddleware:
+    """Counts, times and tracks in-flight requests per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(scope)
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        http_requests_in_flight.inc(method, route)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_request_seconds.observe(time.perf_counter() - start, method, route)
+            http_requests.inc(method, route, status)
+            http_requests_in_flight.dec(method, route)
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Measures how long requests wait for a pooled MongoDB connection"""
+
+    def __init__(self):
+        # Check-out start and finish run on the same thread
+        self._started: Dict[Tuple[Any, int], float] = {}
+        self._lock = threading.Lock()
+
+    def _waited(self, event) -> Optional[float]:
+        with self._lock:
+            start = self._started.pop((event.address, threading.get_ident()), None)
+        return None if start is None else time.perf_counter() - start
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self._started[(event.address, threading.get_ident())] = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        waited = self._waited(event)
+        if waited is not None:
+            pool_checkout_seconds.observe(waited, "success")
+        pool_connections_checked_out.inc()
+
+    def connection_check_out_failed(self, event):
+        waited = self._waited(event)
+        if waited is not None:
+            pool_checkout_seconds.observe(waited, str(event.reason))
+
+    def connection_checked_in(self, event):
+        pool_connections_checked_out.dec()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+# Listener registered on the Motor client
+pool_monitor = PoolMonitor()
+
+async def monitor_loop_lag(interval: float = LOOP_LAG_INTERVAL):
+    """Sleep in a loop and record how late each wake-up is"""
+    loop = asyncio.get_running_loop()
+    while True:
+        due = loop.time() + interval
+        await asyncio.sleep(interval)
+        event_loop_lag_seconds.observe(max(0.0, loop.time() - due))
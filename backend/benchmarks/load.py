@@ -0,0 +1,298 @@
+"""Mixed-traffic load benchmark of the API
+
+Boots app.main:app in-process against MongoDB (MONGODB_URL) or an
+in-memory stand-in (mongomock-motor), seeds a catalog through
+app.init_db and drives browse, search, product detail, cart and
+checkout traffic from concurrent virtual shoppers over an async client.
+Reports throughput and p50/p95/p99 latency per route and can save the
+results as JSON to compare against a later run.
+
+The client shares the server's event loop, so absolute numbers include
+client overhead; compare runs made with the same settings. The
+in-memory stand-in cannot run search or the card view, so those are
+left out of in-memory runs.
+
+Run from the backend directory:
+
+    python -m benchmarks.load [--products 5000] [--users 20] [--requests 5000]
+                              [--in-memory] [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import httpx
+
+# Relative weight of each scenario in the traffic mix
+SCENARIO_WEIGHTS = {
+    "browse": 35,
+    "search": 15,
+    "product_detail": 30,
+    "cart_add": 10,
+    "cart_update": 5,
+    "checkout": 5,
+}
+
+# mongomock lacks $lookup with let/pipeline (card view) and $indexOfArray
+# (search ranking), so in-memory runs leave those out of the mix
+IN_MEMORY_UNSUPPORTED = {"search"}
+
+SEARCH_TERMS = ["oak", "sofa", "modern", "desk", "walnut chair", "velvet", "tabel", "book"]
+SORT_FIELDS = ["created_at", "price", "name", "rating"]
+
+def use_in_memory_database():
+    """Point the app at mongomock-motor instead of a MongoDB server"""
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        raise SystemExit("--in-memory needs mongomock-motor: pip install mongomock-motor")
+    from app import database
+    database.client = AsyncMongoMockClient()
+    database.db = database.client["furniture_haven_benchmark"]
+    # mongomock has no replica set, so run writes without transactions
+    database._transactions_supported = False
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(values)))
+    return values[min(rank, len(values)) - 1]
+
+class Recorder:
+    """Latency and status of every request, grouped by route template"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[Tuple[float, int]]] = {}
+
+    def add(self, route: str, seconds: float, status: int):
+        self.samples.setdefault(route, []).append((seconds, status))
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        routes = {}
+        for route, samples in sorted(self.samples.items()):
+            latencies = sorted(seconds * 1000 for seconds, _ in samples)
+            statuses: Dict[str, int] = {}
+            for _, status in samples:
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+            routes[route] = {
+                "requests": len(samples),
+                "throughput": len(samples) / elapsed,
+                "errors": sum(1 for _, status in samples if status >= 500 or status == 0),
+                "statuses": statuses,
+                "mean_ms": sum(latencies) / len(latencies),
+                "p50_ms": percentile(latencies, 50),
+                "p95_ms": percentile(latencies, 95),
+                "p99_ms": percentile(latencies, 99),
+            }
+        total = sum(len(samples) for samples in self.samples.values())
+        return {"elapsed_s": elapsed, "requests": total, "throughput": total / elapsed, "routes": routes}
+
+class Shopper:
+    """A virtual user with its own account, address and cart"""
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        recorder: Recorder,
+        products: List[Dict[str, Any]],
+        rng: random.Random,
+        weights: Dict[str, int],
+        views: List[str]
+    ):
+        self.client = client
+        self.recorder = recorder
+        self.products = products
+        self.rng = rng
+        self.weights = weights
+        self.views = views
+        self.headers: Dict[str, str] = {}
+        self.address_id: Optional[str] = None
+        self.cart: Dict[str, str] = {}
+
+    async def sign_up(self, index: int, run_id: str):
+        email = f"bench-{run_id}-{index}@example.com"
+        password = "benchmark-password"
+        await self.client.post("/api/register", json={"email": email, "full_name": f"Shopper {index}", "password": password})
+        token = (await self.client.post("/api/login", data={"username": email, "password": password})).json()["access_token"]
+        self.headers = {"Authorization": f"Bearer {token}"}
+        address = await self.client.post("/api/users/me/addresses", headers=self.headers, json={
+            "address_line1": "1 Benchmark Way", "city": "Testville", "state": "TS",
+            "postal_code": "00000", "country": "US", "is_default": True
+        })
+        self.address_id = address.json()["id"]
+
+    async def request(self, route: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except Exception:
+            self.recorder.add(route, time.perf_counter() - started, 0)
+            return None
+        self.recorder.add(route, time.perf_counter() - started, response.status_code)
+        return response
+
+    def _product(self) -> Dict[str, Any]:
+        return self.rng.choice(self.products)
+
+    async def browse(self):
+        params = {"limit": 24, "sort_by": self.rng.choice(SORT_FIELDS), "view": self.rng.choice(self.views)}
+        await self.request("GET /api/products/", "GET", "/api/products/", params=params)
+
+    async def search(self):
+        await self.request("GET /api/products/ (search)", "GET", "/api/products/", params={"search": self.rng.choice(SEARCH_TERMS), "limit": 24})
+
+    async def product_detail(self):
+        product = self._product()
+        if self.rng.random() < 0.5:
+            await self.request("GET /api/products/{product_id}", "GET", f"/api/products/{product['_id']}")
+        else:
+            await self.request("GET /api/products/slug/{slug}", "GET", f"/api/products/slug/{product['slug']}")
+
+    async def cart_add(self):
+        product = self._product()
+        response = await self.request("POST /api/cart/", "POST", "/api/cart/", headers=self.headers, json={"product_id": product["_id"], "quantity": 1})
+        if response is not None and response.status_code == 201:
+            self.cart[product["_id"]] = response.json()["id"]
+
+    async def cart_update(self):
+        if not self.cart:
+            await self.cart_add()
+            return
+        item_id = self.rng.choice(list(self.cart.values()))
+        await self.request("PUT /api/cart/{item_id}", "PUT", f"/api/cart/{item_id}", headers=self.headers, json={"quantity": self.rng.randint(1, 2)})
+
+    async def checkout(self):
+        if not self.cart:
+            await self.cart_add()
+        if not self.cart:
+            return
+        cart = await self.request("GET /api/cart/", "GET", "/api/cart/", headers=self.headers)
+        if cart is None or cart.status_code != 200:
+            return
+        items = [{"product_id": item["product"]["id"], "quantity": item["quantity"]} for item in cart.json()]
+        order = await self.request("POST /api/orders/", "POST", "/api/orders/", headers=self.headers, json={"address_id": self.address_id, "items": items})
+        # A placed order empties the cart; start over after one that was rejected
+        if order is None or order.status_code != 201:
+            await self.request("DELETE /api/cart/", "DELETE", "/api/cart/", headers=self.headers)
+        self.cart = {}
+
+    async def run(self, deadline: float, budget: List[int]):
+        scenarios = list(self.weights)
+        weights = list(self.weights.values())
+        # budget is shared by all shoppers: [requests left]
+        while budget[0] > 0 and time.perf_counter() < deadline:
+            budget[0] -= 1
+            await getattr(self, self.rng.choices(scenarios, weights)[0])()
+
+async def seed_catalog(products: int, batch_size: int) -> List[Dict[str, Any]]:
+    from app import repositories as repo
+    from app.init_db import seed_data
+    await seed_data(synthetic=products, batch_size=batch_size)
+    return await repo.products.project({"is_active": True, "stock": {"$gt": 0}}, ["slug"])
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def run(args) -> Dict[str, Any]:
+    weights = dict(SCENARIO_WEIGHTS)
+    views = ["card", "detail"]
+    if args.in_memory:
+        use_in_memory_database()
+        weights = {name: weight for name, weight in weights.items() if name not in IN_MEMORY_UNSUPPORTED}
+        views = ["detail"]
+    from app.main import app
+
+    # Seed before startup so the search and category indexes include the catalog
+    products = await seed_catalog(args.products, args.batch_size)
+    if not products:
+        raise SystemExit("No products in stock to benchmark against")
+
+    recorder = Recorder()
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        limits = httpx.Limits(max_connections=args.users)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", limits=limits, timeout=60) as client:
+            shoppers = [
+                Shopper(client, recorder, products, random.Random(args.seed + index), weights, views)
+                for index in range(args.users)
+            ]
+            run_id = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
+            await asyncio.gather(*[shopper.sign_up(index, run_id) for index, shopper in enumerate(shoppers)])
+
+            budget = [args.requests]
+            started = time.perf_counter()
+            deadline = started + args.duration if args.duration else float("inf")
+            await asyncio.gather(*[shopper.run(deadline, budget) for shopper in shoppers])
+            elapsed = time.perf_counter() - started
+
+    return {
+        "config": {
+            "products": args.products,
+            "users": args.users,
+            "requests": args.requests,
+            "duration": args.duration,
+            "seed": args.seed,
+            "database": "in-memory" if args.in_memory else "mongodb",
+            "weights": weights,
+            "views": views,
+        },
+        "environment": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "fast_json": os.environ.get("FAST_JSON_RESPONSES", "true"),
+            "timestamp": datetime.utcnow().isoformat(),
+        },
+        "results": recorder.summary(elapsed),
+    }
+
+def print_report(results: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    summary = results["results"]
+    previous = (baseline or {}).get("results", {}).get("routes", {})
+    print(f"{summary['requests']} requests in {summary['elapsed_s']:.1f}s ({summary['throughput']:.1f} req/s)")
+    header = f"{'route':<36}{'reqs':>7}{'req/s':>9}{'err':>6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    print(header + (f"{'p95 vs base':>13}" if baseline else ""))
+    for route, stats in summary["routes"].items():
+        line = (
+            f"{route:<36}{stats['requests']:>7}{stats['throughput']:>9.1f}{stats['errors']:>6}"
+            f"{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}{stats['p99_ms']:>9.2f}"
+        )
+        if baseline and route in previous and previous[route]["p95_ms"]:
+            change = (stats["p95_ms"] - previous[route]["p95_ms"]) / previous[route]["p95_ms"] * 100
+            line += f"{change:>+12.1f}%"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=5000, help="generated products to seed")
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual shoppers")
+    parser.add_argument("--requests", type=int, default=5000, help="total scenario steps to run")
+    parser.add_argument("--duration", type=float, default=0, help="stop after this many seconds (0 = no limit)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="seeding batch size")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the traffic mix")
+    parser.add_argument("--in-memory", action="store_true", help="use mongomock-motor instead of MONGODB_URL")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline results JSON to compare p95 latency against")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as stream:
+            baseline = json.load(stream)
+    print_report(results, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as stream:
+            json.dump(results, stream, indent=2)
+
+if __name__ == "__main__":
+    main()
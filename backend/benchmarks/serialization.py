@@ -0,0 +1,132 @@
+"""Micro-benchmark of response serialization for the hot read endpoints
+
+Compares FastAPI's default response_model path (validate, dump to
+Python, json.dumps) with the fast path in app.utils.responses on
+synthetic payloads shaped like real responses. No database is needed.
+
+Run from the backend directory:
+
+    python -m benchmarks.serialization [--items 48] [--repeat 200]
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, List
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from app.schemas import CartItemResponse, CategoryResponse, ProductCardResponse, ProductResponse
+from app.utils.responses import encode_json
+
+def _id() -> str:
+    return str(uuid.uuid4())
+
+def make_category(index: int) -> dict:
+    return {
+        "_id": _id(),
+        "name": f"Category {index}",
+        "slug": f"category-{index}",
+        "description": "Furniture for every room of the house. " * 3,
+        "image_url": f"https://example.com/categories/{index}.jpg",
+    }
+
+def make_product(index: int, categories: List[dict]) -> dict:
+    product_id = _id()
+    return {
+        "_id": product_id,
+        "name": f"Oak Dining Chair {index}",
+        "slug": f"oak-dining-chair-{index}",
+        "description": "Solid oak chair with a hand-finished seat and tapered legs. " * 12,
+        "price": 149.99 + index,
+        "sale_price": 129.99 + index if index % 3 == 0 else None,
+        "stock": 25,
+        "is_active": True,
+        "category_ids": [category["_id"] for category in categories],
+        "created_at": datetime(2024, 1, 1),
+        "updated_at": datetime(2024, 2, 1),
+        "categories": categories,
+        "images": [
+            {
+                "_id": _id(),
+                "product_id": product_id,
+                "image_url": f"https://example.com/products/{index}/{n}.jpg",
+                "alt_text": f"Oak chair view {n}",
+                "is_primary": n == 0,
+            }
+            for n in range(4)
+        ],
+    }
+
+def make_card(product: dict) -> dict:
+    return {**product, "categories": [], "images": product["images"][:1]}
+
+def make_cart_item(product: dict) -> dict:
+    return {
+        "_id": _id(),
+        "user_id": _id(),
+        "product_id": product["_id"],
+        "quantity": 2,
+        "added_at": datetime(2024, 3, 1),
+        "product": product,
+    }
+
+Encoder = Callable[[Any], Awaitable[bytes]]
+
+def default_encoder(response_type: Any) -> Encoder:
+    """What FastAPI does for a route that returns plain content"""
+    field = create_response_field(name="Response", type_=response_type)
+
+    async def encode(content: Any) -> bytes:
+        data = await serialize_response(field=field, response_content=content)
+        return JSONResponse(data).body
+
+    return encode
+
+def fast_encoder(response_type: Any) -> Encoder:
+    async def encode(content: Any) -> bytes:
+        return encode_json(response_type, content)
+
+    return encode
+
+async def timed(encode: Encoder, content: Any, repeat: int) -> float:
+    """Mean milliseconds per call"""
+    await encode(content)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        await encode(content)
+    return (time.perf_counter() - started) * 1000 / repeat
+
+async def run(items: int, repeat: int):
+    categories = [make_category(index) for index in range(12)]
+    products = [make_product(index, categories[:2]) for index in range(items)]
+    cases = [
+        ("products list", List[ProductResponse], products),
+        ("products list (card)", List[ProductCardResponse], [make_card(p) for p in products]),
+        ("product detail", ProductResponse, products[0]),
+        ("categories", List[CategoryResponse], categories),
+        ("cart", List[CartItemResponse], [make_cart_item(p) for p in products[:10]]),
+    ]
+
+    print(f"{'endpoint':<24}{'default ms':>12}{'fast ms':>10}{'speedup':>10}{'bytes':>10}")
+    for name, response_type, content in cases:
+        default = default_encoder(response_type)
+        fast = fast_encoder(response_type)
+        body = await fast(content)
+        # Both paths must produce the same document
+        assert json.loads(body) == json.loads(await default(content)), name
+        before = await timed(default, content, repeat)
+        after = await timed(fast, content, repeat)
+        print(f"{name:<24}{before:>12.3f}{after:>10.3f}{before / after:>9.1f}x{len(body):>10}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=48, help="items per listing page")
+    parser.add_argument("--repeat", type=int, default=200, help="iterations per measurement")
+    args = parser.parse_args()
+    asyncio.run(run(args.items, args.repeat))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import os
+
+# Startup index and plan checks need a real server; mongomock cannot explain
+os.environ.setdefault("VERIFY_INDEXES", "false")
+
+from typing import Any, Callable, List
+import asyncio
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+from app import database
+from app.main import app
+from app.models import Category, Product, ProductImage, User
+from app.utils import auth, cache
+
+@pytest.fixture
+def client(monkeypatch):
+    """App client backed by a fresh in-memory database"""
+    mongo = AsyncMongoMockClient()
+    monkeypatch.setattr(database, "client", mongo)
+    monkeypatch.setattr(database, "db", mongo["furniture_haven_test"])
+    # mongomock has no replica set, so writes run without transactions
+    monkeypatch.setattr(database, "_transactions_supported", False)
+    # Process-wide caches would otherwise carry entries over from earlier tests
+    for ttl_cache in (cache.product_cache, cache.token_cache, cache.principal_cache):
+        ttl_cache.clear()
+    with TestClient(app) as test_client:
+        yield test_client
+    app.dependency_overrides.clear()
+
+@pytest.fixture
+def run(client) -> Callable[..., Any]:
+    """Run a coroutine function on the app's event loop"""
+    return client.portal.call
+
+@pytest.fixture
+def concurrently(run) -> Callable[..., List[httpx.Response]]:
+    """Send (method, url, kwargs) requests to the app at the same time"""
+    async def send(requests):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            return await asyncio.gather(*[async_client.request(method, url, **kwargs) for method, url, kwargs in requests])
+    return lambda *requests: run(send, requests)
+
+@pytest.fixture
+def hold_after_read(monkeypatch) -> Callable[[Any], None]:
+    """Pause every find_one on a repository so concurrent requests all read before any writes"""
+    def _hold(repository):
+        find_one = repository.find_one
+        async def slow_find_one(*args, **kwargs):
+            found = await find_one(*args, **kwargs)
+            await asyncio.sleep(0.05)
+            return found
+        monkeypatch.setattr(repository, "find_one", slow_find_one)
+    return _hold
+
+@pytest.fixture
+def login(client) -> Callable[[User], None]:
+    """Authenticate every following request as the given user"""
+    def _login(user: User):
+        for dependency in (auth.get_current_user, auth.get_current_active_user, auth.get_current_admin_user):
+            app.dependency_overrides[dependency] = lambda: user
+    return _login
+
+@pytest.fixture
+def make_user(run) -> Callable[..., User]:
+    def _make_user(email: str = "shopper@example.com", is_admin: bool = False) -> User:
+        user = User(email=email, full_name="Test Shopper", hashed_password="unused", is_admin=is_admin)
+        run(user.insert)
+        return user
+    return _make_user
+
+@pytest.fixture
+def category(run) -> Category:
+    db_category = Category(name="Living Room", slug="living-room")
+    run(db_category.insert)
+    return db_category
+
+@pytest.fixture
+def make_products(run, category) -> Callable[..., List[Product]]:
+    def _make_products(count: int = 1, stock: int = 5, **fields) -> List[Product]:
+        async def insert():
+            products = []
+            for index in range(count):
+                product = Product(
+                    name=f"Chair {index}",
+                    slug=f"chair-{index}",
+                    description="An oak chair",
+                    price=100.0 + index,
+                    stock=stock,
+                    category_ids=[category.id],
+                    **fields
+                )
+                await product.insert()
+                await ProductImage(product_id=product.id, image_url=f"https://img.example.com/{index}.jpg", is_primary=True).insert()
+                products.append(product)
+            return products
+        return run(insert)
+    return _make_products
+
+@pytest.fixture
+def address(client, login, make_user) -> dict:
+    """A shopper, logged in, with a default address"""
+    login(make_user())
+    response = client.post("/api/users/me/addresses", json={
+        "address_line1": "1 Test Street", "city": "Testville", "state": "TS",
+        "postal_code": "00000", "country": "US", "is_default": True
+    })
+    return response.json()
@@ -0,0 +1,42 @@
+import time
+from app import repositories as repo
+from app.utils.auth import create_access_token
+
+def _headers(user):
+    return {"Authorization": f"Bearer {create_access_token({'sub': user.id})}"}
+
+def test_repeat_requests_reuse_the_loaded_user(client, monkeypatch, make_user):
+    user = make_user()
+    headers = _headers(user)
+    loads = []
+    get = repo.users.get
+    async def counting_get(*args, **kwargs):
+        loads.append(args)
+        return await get(*args, **kwargs)
+    monkeypatch.setattr(repo.users, "get", counting_get)
+    
+    for _ in range(3):
+        assert client.get("/api/users/me", headers=headers).status_code == 200
+    assert len(loads) == 1
+
+def test_user_changes_reach_the_next_request(client, run, make_user):
+    user = make_user()
+    headers = _headers(user)
+    assert client.get("/api/users/me", headers=headers).json()["full_name"] == "Test Shopper"
+    
+    client.put("/api/users/me", json={"full_name": "Renamed Shopper"}, headers=headers)
+    assert client.get("/api/users/me", headers=headers).json()["full_name"] == "Renamed Shopper"
+    
+    # Writes outside the profile route drop the cached user too
+    stored = run(repo.users.get, user.id)
+    stored.is_active = False
+    run(repo.users.replace, stored)
+    assert client.get("/api/users/me", headers=headers).status_code == 400
+
+def test_cached_tokens_still_expire(client, monkeypatch, make_user):
+    headers = _headers(make_user())
+    assert client.get("/api/users/me", headers=headers).status_code == 200
+    
+    later = time.time() + 24 * 60 * 60
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert client.get("/api/users/me", headers=headers).status_code == 401
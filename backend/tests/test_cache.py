@@ -0,0 +1,54 @@
+from app.utils.cache import TTLCache, product_cache
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+def test_entries_expire_after_the_ttl():
+    clock = Clock()
+    cache = TTLCache(maxsize=10, ttl=60, timer=clock)
+    cache.set("a", 1)
+    clock.now = 59
+    assert cache.get("a") == 1
+    clock.now = 60
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+def test_per_entry_ttl_can_only_shorten():
+    clock = Clock()
+    cache = TTLCache(maxsize=10, ttl=60, timer=clock)
+    cache.set("short", 1, ttl=5)
+    cache.set("long", 2, ttl=600)
+    cache.set("expired", 3, ttl=0)
+    clock.now = 30
+    assert cache.get("short") is None
+    assert cache.get("long") == 2
+    clock.now = 61
+    assert cache.get("long") is None
+    assert cache.get("expired") is None
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+def test_product_changes_invalidate_cached_details(client, login, make_user, make_products):
+    product, = make_products()
+    login(make_user("admin@example.com", is_admin=True))
+    assert client.get(f"/api/products/{product.id}").json()["price"] == 100.0
+    assert client.get(f"/api/products/slug/{product.slug}").status_code == 200
+    assert product_cache.get(("id", product.id)) is not None
+    
+    client.put(f"/api/products/{product.id}", json={"price": 80.0, "slug": "oak-chair"})
+    assert client.get(f"/api/products/{product.id}").json()["price"] == 80.0
+    # The old slug no longer serves the cached copy
+    assert client.get(f"/api/products/slug/{product.slug}").status_code == 404
+    assert client.get("/api/products/slug/oak-chair").json()["price"] == 80.0
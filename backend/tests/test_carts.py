@@ -0,0 +1,115 @@
+from pymongo.errors import BulkWriteError
+from app import repositories as repo
+from app.utils import carts
+from app.utils.carts import merge_guest_cart
+
+def _guest_cart(client, *lines):
+    """Start a guest cart holding (product, quantity) lines and return its token"""
+    token = client.post("/api/guest-cart/session").json()["token"]
+    for product, quantity in lines:
+        response = client.post("/api/guest-cart/", json={"product_id": product.id, "quantity": quantity},
+                               headers={"X-Guest-Cart": token})
+        assert response.status_code == 201
+    return token
+
+def _cart(client):
+    return {item["product"]["id"]: item["quantity"] for item in client.get("/api/cart/").json()}
+
+def test_guest_cart_becomes_the_user_cart(client, run, login, make_user, make_products):
+    chair, table = make_products(2)
+    token = _guest_cart(client, (chair, 2), (table, 1))
+    guest_lines = {line.product_id: line.id for line in run(carts.guest_cart(token).lines)}
+    user = make_user()
+    
+    run(merge_guest_cart, token, user.id)
+    
+    login(user)
+    assert _cart(client) == {chair.id: 2, table.id: 1}
+    # Moved lines keep their ids
+    assert {line.product_id: line.id for line in run(carts.user_cart(user.id).lines)} == guest_lines
+    assert client.get("/api/guest-cart/", headers={"X-Guest-Cart": token}).json() == []
+
+def test_merge_adds_to_existing_lines_within_stock(client, run, login, make_user, make_products):
+    chair, table = make_products(2, stock=5)
+    user = make_user()
+    login(user)
+    client.post("/api/cart/", json={"product_id": chair.id, "quantity": 3})
+    client.post("/api/cart/", json={"product_id": table.id, "quantity": 1})
+    token = _guest_cart(client, (chair, 4), (table, 2))
+    
+    run(merge_guest_cart, token, user.id)
+    
+    assert _cart(client) == {chair.id: 5, table.id: 3}
+
+def test_merge_drops_lines_for_sold_out_products(client, run, login, make_user, make_products):
+    chair, table = make_products(2)
+    token = _guest_cart(client, (chair, 1), (table, 1))
+    run(repo.products.update_one, {"_id": table.id}, {"$set": {"stock": 0}})
+    user = make_user()
+    
+    run(merge_guest_cart, token, user.id)
+    
+    login(user)
+    assert _cart(client) == {chair.id: 1}
+    assert run(repo.guest_carts.get, carts.guest_cart_id(token)) is None
+
+def test_merge_retries_lines_changed_concurrently(client, run, login, monkeypatch, make_user, make_products):
+    chair, = make_products(stock=10)
+    user = make_user()
+    login(user)
+    client.post("/api/cart/", json={"product_id": chair.id, "quantity": 1})
+    token = _guest_cart(client, (chair, 2))
+    
+    # Another request adds to the line right after the merge reads the cart
+    get = repo.carts.get
+    async def get_then_add(*args, **kwargs):
+        cart = await get(*args, **kwargs)
+        monkeypatch.setattr(repo.carts, "get", get)
+        await carts.user_cart(user.id).add(chair.id, 4)
+        return cart
+    monkeypatch.setattr(repo.carts, "get", get_then_add)
+    
+    run(merge_guest_cart, token, user.id)
+    
+    assert _cart(client) == {chair.id: 7}
+    assert run(repo.guest_carts.get, carts.guest_cart_id(token)) is None
+
+def test_unmerged_lines_stay_in_the_guest_cart(client, run, login, monkeypatch, make_user, make_products):
+    chair, = make_products()
+    token = _guest_cart(client, (chair, 1))
+    user = make_user()
+    
+    async def failing_bulk_write(operations, **kwargs):
+        raise BulkWriteError({"writeErrors": [{"index": 0, "errmsg": "conflict"}]})
+    monkeypatch.setattr(repo.carts, "bulk_write", failing_bulk_write)
+    
+    run(merge_guest_cart, token, user.id)
+    
+    login(user)
+    assert _cart(client) == {}
+    assert [line.product_id for line in run(carts.guest_cart(token).lines)] == [chair.id]
+
+def test_cart_lines_live_in_one_document(client, run, login, make_user, make_products):
+    chair, table = make_products(2, stock=5)
+    user = make_user()
+    login(user)
+    
+    line = client.post("/api/cart/", json={"product_id": chair.id, "quantity": 2}).json()
+    client.post("/api/cart/", json={"product_id": table.id, "quantity": 1})
+    # Adding a product already in the cart tops up its line
+    topped_up = client.post("/api/cart/", json={"product_id": chair.id, "quantity": 3}).json()
+    assert topped_up["id"] == line["id"] and topped_up["quantity"] == 5
+    assert _cart(client) == {chair.id: 5, table.id: 1}
+    assert len(run(repo.carts.get, user.id).lines) == 2
+    
+    # Past the product's stock
+    response = client.post("/api/cart/", json={"product_id": chair.id, "quantity": 1})
+    assert response.status_code == 400
+    
+    assert client.put(f"/api/cart/{line['id']}", json={"quantity": 1}).json()["quantity"] == 1
+    assert client.delete(f"/api/cart/{line['id']}").status_code == 204
+    assert client.delete(f"/api/cart/{line['id']}").status_code == 404
+    assert _cart(client) == {table.id: 1}
+    
+    client.delete("/api/cart/")
+    assert _cart(client) == {}
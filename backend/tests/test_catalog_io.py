@@ -0,0 +1,94 @@
+import asyncio
+from app import repositories as repo
+from app.utils.catalog_io import read_records
+
+def _records(body: bytes, format: str, chunk_size: int = 7):
+    """Parse a body fed in small chunks, so records and characters straddle chunk edges"""
+    async def chunks():
+        for start in range(0, len(body), chunk_size):
+            yield body[start:start + chunk_size]
+    async def collect():
+        return [record async for record in read_records(chunks(), format)]
+    return asyncio.run(collect())
+
+def _import(client, body, format="ndjson"):
+    response = client.post(f"/api/products/import?format={format}", content=body.encode())
+    assert response.status_code == 200
+    return response.json()
+
+def test_sparse_rows_keep_unlisted_fields(client, run, login, make_user, make_products):
+    product, = make_products(stock=7)
+    login(make_user("admin@example.com", is_admin=True))
+    
+    report = _import(client, '{"slug": "chair-0", "name": "Armchair", "description": "Reupholstered", "price": 250}\n')
+    assert report["updated"] == 1 and report["failed"] == 0
+    
+    stored = run(repo.products.get, product.id)
+    assert stored.name == "Armchair" and stored.price == 250
+    assert stored.stock == 7
+    assert stored.category_ids == product.category_ids
+    assert len(run(repo.product_images.find_many, {"product_id": product.id})) == 1
+
+def test_new_products_get_defaults(client, run, login, make_user, category):
+    login(make_user("admin@example.com", is_admin=True))
+    
+    report = _import(client, "name,slug,description,price\nStool,stool,A pine stool,40\n", format="csv")
+    assert report["created"] == 1
+    
+    stored = run(repo.products.find_one, {"slug": "stool"})
+    assert stored.stock == 0 and stored.is_active and stored.category_ids == []
+    assert stored.rating.count == 0
+
+def test_csv_quoted_cells_may_hold_commas_quotes_and_newlines():
+    body = (
+        '\ufeffname,slug,description,price,categories\r\n'
+        '"Sofa, 3 seat",sofa,"Deep ""cloud"" cushions\r\nin linen",899,living-room|lounge\r\n'
+        'Stool,stool,,40,\r\n'
+    ).encode()
+    records = _records(body, "csv")
+    assert records == [
+        (1, {"name": "Sofa, 3 seat", "slug": "sofa", "description": 'Deep "cloud" cushions\nin linen',
+             "price": "899", "categories": ["living-room", "lounge"]}),
+        # Empty cells are left out so they fall back to defaults
+        (2, {"name": "Stool", "slug": "stool", "price": "40"}),
+    ]
+
+def test_csv_rows_that_cannot_be_parsed_are_reported():
+    records = _records(b'name,slug\nA,a,extra\nB,b\n"Unclosed,c\n', "csv")
+    assert isinstance(records[0][1], ValueError)
+    assert records[1] == (2, {"name": "B", "slug": "b"})
+    assert records[2][0] == 3 and "Unterminated" in str(records[2][1])
+
+def test_bad_ndjson_rows_do_not_stop_the_import(client, login, make_user, category):
+    login(make_user("admin@example.com", is_admin=True))
+    body = "\n".join([
+        '{"slug": "stool", "name": "Stool", "description": "Pine", "price": 40, "categories": ["living-room"]}',
+        '{"slug": "broken", "name": ',
+        '',
+        '{"slug": "bench", "name": "Bench", "description": "Oak", "price": "cheap"}',
+        '{"slug": "lamp", "name": "Lamp", "description": "Brass", "price": 60, "categories": ["garden"]}',
+        '{"slug": "desk", "name": "Desk", "description": "Walnut", "price": 300}',
+    ])
+    
+    report = _import(client, body)
+    assert report["created"] == 2 and report["failed"] == 3
+    errors = {error["row"]: error for error in report["errors"]}
+    assert errors[2]["error"].startswith("Invalid JSON")
+    assert errors[3]["slug"] == "bench" and "price" in errors[3]["error"]
+    assert errors[4]["error"] == "Unknown categories: garden"
+
+def test_exports_import_back_unchanged(client, run, login, make_user, make_products):
+    products = make_products(3, stock=4)
+    login(make_user("admin@example.com", is_admin=True))
+    
+    for format in ("csv", "ndjson"):
+        exported = client.get(f"/api/products/export?format={format}").text
+        assert len(exported.strip().splitlines()) == (4 if format == "csv" else 3)
+        report = _import(client, exported, format=format)
+        assert report["updated"] == 3 and report["failed"] == 0
+    
+    for product in products:
+        stored = run(repo.products.get, product.id)
+        assert (stored.name, stored.price, stored.stock, stored.category_ids) == (product.name, product.price, 4, product.category_ids)
+        images = run(repo.product_images.find_many, {"product_id": product.id})
+        assert [(image.image_url, image.is_primary) for image in images] == [(f"https://img.example.com/{product.slug[-1]}.jpg", True)]
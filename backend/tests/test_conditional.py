@@ -0,0 +1,40 @@
+from app import repositories as repo
+
+def test_product_detail_answers_if_none_match_with_304(client, make_products):
+    product, = make_products()
+    first = client.get(f"/api/products/{product.id}")
+    
+    response = client.get(f"/api/products/{product.id}", headers={"If-None-Match": first.headers["ETag"]})
+    
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == first.headers["ETag"]
+
+def test_listings_answer_if_none_match_with_304(client, make_products):
+    make_products(count=2)
+    for url in ("/api/products/", "/api/products/facets", "/api/products/categories/all"):
+        etag = client.get(url).headers["ETag"]
+        assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+def test_changed_product_gets_a_new_etag(client, login, make_user, make_products):
+    product, = make_products()
+    etag = client.get(f"/api/products/{product.id}").headers["ETag"]
+    login(make_user("admin@example.com", is_admin=True))
+    client.put(f"/api/products/{product.id}", json={"price": 80.0})
+    
+    response = client.get(f"/api/products/{product.id}", headers={"If-None-Match": etag})
+    
+    assert response.status_code == 200
+    assert response.json()["price"] == 80.0
+    assert response.headers["ETag"] != etag
+
+def test_new_image_changes_the_listing_etag(client, run, make_products):
+    product, = make_products()
+    etag = client.get("/api/products/").headers["ETag"]
+    
+    async def add_image():
+        from app.models import ProductImage
+        await repo.product_images.insert(ProductImage(product_id=product.id, image_url="https://img.example.com/new.jpg"))
+    run(add_image)
+    
+    assert client.get("/api/products/", headers={"If-None-Match": etag}).status_code == 200
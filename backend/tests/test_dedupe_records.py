@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+from app import database
+from app import repositories as repo
+from app.dedupe_records import remove_duplicates
+from app.models import CartItem, Review
+
+def _insert_without_unique_indexes(run, documents):
+    """Write rows the unique indexes would reject, as data from before them"""
+    async def insert():
+        for document in documents:
+            collection = database.db[type(document).Settings.name]
+            await collection.drop_indexes()
+            await collection.insert_one(document.model_dump(by_alias=True))
+    run(insert)
+
+def test_duplicate_cart_lines_merge_into_the_oldest(client, run, make_user, make_products):
+    user = make_user()
+    chair, table = make_products(2)
+    now = datetime.utcnow()
+    oldest = CartItem(user_id=user.id, product_id=chair.id, quantity=2, added_at=now - timedelta(hours=1))
+    _insert_without_unique_indexes(run, [
+        oldest,
+        CartItem(user_id=user.id, product_id=chair.id, quantity=3, added_at=now),
+        CartItem(user_id=user.id, product_id=table.id, quantity=1, added_at=now),
+    ])
+    
+    run(remove_duplicates)
+    
+    lines = {item.id: item.quantity for item in run(repo.cart_items.find_many, {"user_id": user.id})}
+    assert len(lines) == 2
+    assert lines[oldest.id] == 5
+
+def test_duplicate_reviews_keep_the_latest(client, run, make_user, make_products):
+    user = make_user()
+    product, = make_products()
+    now = datetime.utcnow()
+    latest = Review(user_id=user.id, product_id=product.id, rating=5, created_at=now)
+    _insert_without_unique_indexes(run, [
+        Review(user_id=user.id, product_id=product.id, rating=1, created_at=now - timedelta(days=1)),
+        latest,
+    ])
+    
+    run(remove_duplicates)
+    
+    assert [review.id for review in run(repo.reviews.find_many, {"product_id": product.id})] == [latest.id]
+    rating = client.get(f"/api/products/{product.id}").json()["rating"]
+    assert rating["count"] == 1 and rating["average"] == 5.0
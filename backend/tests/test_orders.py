@@ -0,0 +1,90 @@
+from app import repositories as repo
+
+def _stock(run, product_id: str) -> int:
+    async def read():
+        return (await repo.products.get(product_id)).stock
+    return run(read)
+
+def _order(client, address, product, quantity):
+    return client.post("/api/orders/", json={
+        "address_id": address["id"],
+        "items": [{"product_id": product.id, "quantity": quantity}]
+    })
+
+def test_order_beyond_stock_is_rejected(client, run, address, make_products):
+    product, = make_products(stock=5)
+    
+    response = _order(client, address, product, 6)
+    
+    assert response.status_code == 400
+    assert _stock(run, product.id) == 5
+
+def test_rejected_line_releases_the_others(client, run, address, make_products):
+    in_stock, sold_out = make_products(count=2, stock=2)
+    run(lambda: repo.products.update_one({"_id": sold_out.id}, {"$set": {"stock": 0}}))
+    
+    response = client.post("/api/orders/", json={"address_id": address["id"], "items": [
+        {"product_id": in_stock.id, "quantity": 1},
+        {"product_id": sold_out.id, "quantity": 1},
+    ]})
+    
+    assert response.status_code == 400
+    assert _stock(run, in_stock.id) == 2
+
+def test_concurrent_orders_never_oversell(client, run, concurrently, address, make_products):
+    product, = make_products(stock=3)
+    order = ("POST", "/api/orders/", {"json": {"address_id": address["id"], "items": [{"product_id": product.id, "quantity": 1}]}})
+    
+    responses = concurrently(*[order] * 6)
+    
+    assert sorted(response.status_code for response in responses) == [201] * 3 + [400] * 3
+    assert _stock(run, product.id) == 0
+
+def test_cancel_twice_releases_stock_once(client, run, address, make_products):
+    product, = make_products(stock=5)
+    order = _order(client, address, product, 2).json()
+    
+    first = client.put(f"/api/orders/{order['id']}/cancel")
+    second = client.put(f"/api/orders/{order['id']}/cancel")
+    
+    assert first.status_code == 200
+    assert first.json()["status"] == "cancelled"
+    assert second.status_code == 400
+    assert _stock(run, product.id) == 5
+
+def test_concurrent_cancels_release_stock_once(client, run, concurrently, hold_after_read, address, make_products):
+    product, = make_products(stock=5)
+    order = _order(client, address, product, 2).json()
+    cancel = ("PUT", f"/api/orders/{order['id']}/cancel", {})
+    hold_after_read(repo.orders)
+    
+    responses = concurrently(*[cancel] * 5)
+    
+    assert [response.status_code for response in responses].count(200) == 1
+    assert _stock(run, product.id) == 5
+
+def test_status_change_from_cancelled_reserves_stock_again(client, run, login, make_user, address, make_products):
+    product, = make_products(stock=5)
+    order = _order(client, address, product, 2).json()
+    login(make_user("admin@example.com", is_admin=True))
+    
+    client.put(f"/api/orders/{order['id']}/status", params={"status": "cancelled"})
+    assert _stock(run, product.id) == 5
+    
+    response = client.put(f"/api/orders/{order['id']}/status", params={"status": "processing"})
+    assert response.status_code == 200
+    assert _stock(run, product.id) == 3
+
+def test_failed_reservation_keeps_order_cancelled(client, run, login, make_user, address, make_products):
+    product, = make_products(stock=5)
+    order = _order(client, address, product, 2).json()
+    login(make_user("admin@example.com", is_admin=True))
+    client.put(f"/api/orders/{order['id']}/status", params={"status": "cancelled"})
+    # Someone else buys the stock while the order is cancelled
+    run(lambda: repo.products.update_one({"_id": product.id}, {"$set": {"stock": 1}}))
+    
+    response = client.put(f"/api/orders/{order['id']}/status", params={"status": "processing"})
+    
+    assert response.status_code == 400
+    assert client.get(f"/api/orders/{order['id']}").json()["status"] == "cancelled"
+    assert _stock(run, product.id) == 1
@@ -0,0 +1,66 @@
+import pytest
+from app import repositories as repo
+from app.utils.pagination import keyset_filter
+
+def _walk(client, url, **params):
+    """Follow X-Next-Cursor from the first page to the last, returning every id seen"""
+    ids = []
+    cursor = None
+    while True:
+        response = client.get(url, params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        ids += [item["id"] for item in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return ids
+
+@pytest.mark.parametrize("sort_by", ["created_at", "price", "name", "rating"])
+@pytest.mark.parametrize("sort_order", ["asc", "desc"])
+def test_product_cursor_pages_cover_each_product_once(client, run, make_products, sort_by, sort_order):
+    products = make_products(count=11)
+    # Ties on the sort key, and products written before rating summaries existed
+    run(lambda: repo.products.update_many({"_id": {"$in": [p.id for p in products[:4]]}}, {"$set": {"price": 50.0}}))
+    run(lambda: repo.products.update_many({"_id": {"$in": [p.id for p in products[4:8]]}}, {"$unset": {"rating": ""}}))
+    
+    ids = _walk(client, "/api/products/", sort_by=sort_by, sort_order=sort_order, limit=3)
+    
+    assert sorted(ids) == sorted(product.id for product in products)
+
+def test_category_listing_pages(client, run, make_products):
+    products = make_products(count=5)
+    
+    ids = _walk(client, "/api/products/", category="living-room", limit=2)
+    
+    assert sorted(ids) == sorted(product.id for product in products)
+    assert client.get("/api/products/", params={"category": "missing"}).json() == []
+
+def test_order_history_cursor_pages(client, address, make_products):
+    product, = make_products(stock=20)
+    created = [
+        client.post("/api/orders/", json={"address_id": address["id"], "items": [{"product_id": product.id, "quantity": 1}]}).json()["id"]
+        for _ in range(7)
+    ]
+    
+    ids = _walk(client, "/api/orders/", limit=3)
+    
+    assert len(ids) == len(set(ids))
+    assert sorted(ids) == sorted(created)
+
+def test_cursor_for_another_sort_is_rejected(client, make_products):
+    make_products(count=3)
+    cursor = client.get("/api/products/", params={"sort_by": "price", "limit": 1}).headers["X-Next-Cursor"]
+    
+    response = client.get("/api/products/", params={"sort_by": "name", "cursor": cursor})
+    
+    assert response.status_code == 400
+
+def test_keyset_filter_places_missing_values_like_the_sort():
+    assert keyset_filter("rating.average", -1, 4.0, "b") == {"$or": [
+        {"rating.average": {"$lt": 4.0}},
+        {"rating.average": 4.0, "_id": {"$lt": "b"}},
+        {"rating.average": None},
+    ]}
+    assert keyset_filter("rating.average", 1, None, "b") == {"$or": [
+        {"rating.average": {"$ne": None}},
+        {"rating.average": None, "_id": {"$gt": "b"}},
+    ]}
@@ -0,0 +1,84 @@
+from app import repositories as repo
+
+def _rating(client, product_id):
+    return client.get(f"/api/products/{product_id}").json()["rating"]
+
+def _review(client, product_id, rating):
+    response = client.post(f"/api/products/{product_id}/reviews", json={"product_id": product_id, "rating": rating})
+    assert response.status_code == 201
+    return response.json()
+
+def test_rating_summary_follows_reviews(client, login, make_user, make_products):
+    product, = make_products()
+    login(make_user("first@example.com"))
+    first = _review(client, product.id, 5)
+    login(make_user("second@example.com"))
+    second = _review(client, product.id, 3)
+    
+    rating = _rating(client, product.id)
+    assert rating["count"] == 2
+    assert rating["average"] == 4.0
+    assert rating["histogram"]["5"] == 1 and rating["histogram"]["3"] == 1
+    
+    # Update
+    client.put(f"/api/products/{product.id}/reviews/{second['id']}", json={"rating": 1})
+    rating = _rating(client, product.id)
+    assert rating["count"] == 2
+    assert rating["average"] == 3.0
+    assert rating["histogram"]["3"] == 0 and rating["histogram"]["1"] == 1
+    
+    # Delete
+    login(make_user("admin@example.com", is_admin=True))
+    client.delete(f"/api/products/{product.id}/reviews/{first['id']}")
+    rating = _rating(client, product.id)
+    assert rating["count"] == 1
+    assert rating["average"] == 1.0
+    assert rating["histogram"]["5"] == 0
+
+def test_null_rating_is_rejected(client, login, make_user, make_products):
+    product, = make_products()
+    login(make_user())
+    review = _review(client, product.id, 4)
+    
+    response = client.put(f"/api/products/{product.id}/reviews/{review['id']}", json={"rating": None})
+    
+    assert response.status_code == 400
+    assert _rating(client, product.id)["average"] == 4.0
+
+def test_comment_only_update_leaves_summary_alone(client, login, make_user, make_products):
+    product, = make_products()
+    login(make_user())
+    review = _review(client, product.id, 4)
+    
+    response = client.put(f"/api/products/{product.id}/reviews/{review['id']}", json={"comment": "Still great"})
+    
+    assert response.json()["comment"] == "Still great"
+    assert _rating(client, product.id) == {"count": 1, "average": 4.0, "histogram": {"1": 0, "2": 0, "3": 0, "4": 1, "5": 0}}
+
+def test_concurrent_deletes_remove_the_rating_once(client, concurrently, hold_after_read, login, make_user, make_products):
+    product, = make_products()
+    login(make_user())
+    review = _review(client, product.id, 5)
+    delete = ("DELETE", f"/api/products/{product.id}/reviews/{review['id']}", {})
+    hold_after_read(repo.reviews)
+    
+    responses = concurrently(delete, delete)
+    
+    assert sorted(response.status_code for response in responses) == [204, 404]
+    assert _rating(client, product.id) == {"count": 0, "average": 0.0, "histogram": {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0}}
+
+def test_concurrent_edits_move_the_summary_once(client, concurrently, hold_after_read, login, make_user, make_products):
+    product, = make_products()
+    login(make_user())
+    review = _review(client, product.id, 3)
+    url = f"/api/products/{product.id}/reviews/{review['id']}"
+    hold_after_read(repo.reviews)
+    
+    responses = concurrently(("PUT", url, {"json": {"rating": 5}}), ("PUT", url, {"json": {"rating": 4}}))
+    
+    assert sorted(response.status_code for response in responses) == [200, 409]
+    kept = next(response.json()["rating"] for response in responses if response.status_code == 200)
+    rating = _rating(client, product.id)
+    assert rating["count"] == 1
+    assert rating["average"] == float(kept)
+    assert rating["histogram"] == {str(stars): int(stars == kept) for stars in range(1, 6)}
@@ -0,0 +1,57 @@
+from app.utils.search import ProductSearchIndex, product_search_index
+
+def _index(*products):
+    index = ProductSearchIndex()
+    for product_id, name, description in products:
+        index.add(product_id, name, description)
+    return index
+
+def _ids(index, query):
+    return [product_id for product_id, _ in index.search(query)]
+
+def test_name_matches_outrank_description_matches():
+    index = _index(
+        ("lamp", "Brass Lamp", "Pairs well with an oak table"),
+        ("table", "Oak Table", "Solid and sturdy"),
+        ("sofa", "Linen Sofa", "Deep seats"),
+    )
+    assert _ids(index, "oak ") == ["table", "lamp"]
+
+def test_every_term_has_to_match():
+    index = _index(("table", "Oak Table", None), ("chair", "Oak Chair", None))
+    assert _ids(index, "oak chair ") == ["chair"]
+    assert _ids(index, "oak stool ") == []
+
+def test_last_term_matches_as_a_prefix_while_typed():
+    index = _index(("sofa", "Linen Sofa", None), ("sideboard", "Walnut Sideboard", None))
+    assert _ids(index, "linen so") == ["sofa"]
+    assert set(_ids(index, "s")) == {"sofa", "sideboard"}
+    # A trailing space marks the word as complete
+    assert _ids(index, "linen so ") == []
+
+def test_exact_terms_outrank_prefix_expansions():
+    index = _index(("desk", "Desk", None), ("desktop", "Desktop Stand", None))
+    assert _ids(index, "desk") == ["desk", "desktop"]
+
+def test_misspelled_terms_fall_back_to_near_spellings():
+    index = _index(("wardrobe", "Pine Wardrobe", None), ("bed", "Pine Bed", None))
+    assert _ids(index, "wardorbe ") == ["wardrobe"]
+    # Short words get no typo budget
+    assert _ids(index, "bad ") == []
+
+def test_removed_products_stop_matching():
+    index = _index(("table", "Oak Table", None), ("chair", "Oak Chair", None))
+    index.remove("table")
+    assert _ids(index, "oak ") == ["chair"]
+    assert _ids(index, "table ") == []
+
+def test_listing_search_returns_ranked_products(client, run, make_products):
+    products = make_products(3)
+    run(product_search_index.rebuild)
+    
+    # Relevance order needs $indexOfArray, which mongomock lacks, so sort by price
+    params = {"sort_by": "price", "sort_order": "asc"}
+    response = client.get("/api/products/", params={"search": "chair 2", **params})
+    assert [product["id"] for product in response.json()] == [products[2].id]
+    response = client.get("/api/products/", params={"search": "oak cha", **params})
+    assert [product["id"] for product in response.json()] == [product.id for product in products]